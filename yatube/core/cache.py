@@ -0,0 +1,31 @@
+"""Бэкенды кэша, считающие попадания и промахи для метрик запроса."""
+from django.core.cache.backends.locmem import LocMemCache as BaseLocMemCache
+
+from .metrics import current_stats
+
+_MISSING = object()
+
+
+class MetricsCacheMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        stats = current_stats.get()
+        if stats is not None:
+            if value is _MISSING:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version)
+        stats = current_stats.get()
+        if stats is not None:
+            stats.cache_hits += len(values)
+            stats.cache_misses += len(keys) - len(values)
+        return values
+
+
+class LocMemCache(MetricsCacheMixin, BaseLocMemCache):
+    pass
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+
+
+@register()
+def cached_lookups_cache(app_configs, **kwargs):
+    """Кэш выборок (core/lookup.py) нельзя держать в памяти процесса."""
+    if settings.CACHED_LOOKUPS and isinstance(caches['default'], LocMemCache):
+        return [Warning(
+            'CACHED_LOOKUPS включён с локальным кэшем процесса.',
+            hint=(
+                'Сбросы из management-команд не дойдут до веб-воркеров: '
+                'нужен общий бэкенд кэша (Memcached, Redis).'
+            ),
+            id='core.W001',
+        )]
+    return []
@@ -0,0 +1,25 @@
+"""Структурированные логи: одна JSON-строка на запись."""
+import json
+import logging
+import logging.handlers
+import os
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(getattr(record, 'event', {}))
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Ротируемый файл, каталог для которого создаётся при первой записи."""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
@@ -0,0 +1,112 @@
+"""Кэш выборок одного объекта по уникальному полю.
+
+``CachedLookup(Group, 'slug').get(slug)`` сначала смотрит в кэш и только
+при промахе идёт в базу. Запись сбрасывается сигналами ``post_save`` и
+``post_delete`` модели, а если уникальное поле поменялось — ещё и по
+старому значению (``pre_save``). ``QuerySet.update``, ``bulk_update`` и
+``_raw_delete`` сигналов не посылают: после них нужен
+``invalidate_many``.
+
+Кэш включается настройкой ``CACHED_LOOKUPS``, и включать его можно
+только с общим для всех процессов бэкендом кэша (Memcached, Redis):
+сброс из команд ``archive_posts``, ``backfill_posts`` и т. п. не дойдёт
+до локального кэша веб-воркеров. Пока кэш выключен, ``get`` читает
+базу. Даже с общим кэшем объект может устареть, поэтому представления,
+которые пишут в базу, читают объект сами, а не через ``CachedLookup``.
+
+Срок жизни записи задаётся для каждой модели в
+``CACHED_LOOKUP_TIMEOUTS``, попадания и промахи считаются в метрике
+``yatube_lookup_cache_requests_total``. Найденный объект кладётся в карту
+идентичности запроса.
+"""
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.http import Http404
+
+from . import identity
+from .metrics import LOOKUP_CACHE
+
+DEFAULT_TIMEOUT = 5 * 60
+LOOKUP_KEY = 'lookup:{label}:{field}:{value}'
+
+
+class CachedLookup:
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.label = model._meta.label
+        uid = f'cached-lookup:{self.label}:{field}'
+        if not model._meta.get_field(field).primary_key:
+            pre_save.connect(
+                self._before_save, sender=model, weak=False, dispatch_uid=uid,
+            )
+        post_save.connect(
+            self._changed, sender=model, weak=False, dispatch_uid=uid,
+        )
+        post_delete.connect(
+            self._changed, sender=model, weak=False, dispatch_uid=uid,
+        )
+
+    def key(self, value):
+        return LOOKUP_KEY.format(
+            label=self.label, field=self.field, value=quote(str(value)),
+        )
+
+    @property
+    def timeout(self):
+        return settings.CACHED_LOOKUP_TIMEOUTS.get(
+            self.label, DEFAULT_TIMEOUT,
+        )
+
+    def get(self, value):
+        """Объект с ``field == value``; ``None``, если такого нет."""
+        if not settings.CACHED_LOOKUPS:
+            return identity.add(self._load(value))
+        key = self.key(value)
+        instance = cache.get(key)
+        if instance is None:
+            LOOKUP_CACHE.inc(model=self.label, result='miss')
+            instance = self._load(value)
+            if instance is not None:
+                cache.set(key, instance, self.timeout)
+        else:
+            LOOKUP_CACHE.inc(model=self.label, result='hit')
+        return identity.add(instance)
+
+    def _load(self, value):
+        return self.model._default_manager.filter(
+            **{self.field: value}
+        ).first()
+
+    def get_or_404(self, value):
+        instance = self.get(value)
+        if instance is None:
+            raise Http404(
+                f'No {self.model._meta.object_name} matches the given query.'
+            )
+        return instance
+
+    def invalidate(self, value):
+        cache.delete(self.key(value))
+
+    def invalidate_many(self, values):
+        cache.delete_many([self.key(value) for value in values])
+
+    def _before_save(self, sender, instance, update_fields=None, **kwargs):
+        if instance.pk is None or (
+            update_fields is not None and self.field not in update_fields
+        ):
+            return
+        previous = (
+            self.model._default_manager.filter(pk=instance.pk)
+            .values_list(self.field, flat=True).first()
+        )
+        if previous is not None and previous != getattr(instance, self.field):
+            self.invalidate(previous)
+
+    def _changed(self, sender, instance, **kwargs):
+        self.invalidate(getattr(instance, self.field))
@@ -0,0 +1,94 @@
+import glob
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Aggregate:
+    __slots__ = ('count', 'total', 'max', 'example')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.example = None
+
+    def add(self, duration, example):
+        self.count += 1
+        self.total += duration
+        if duration >= self.max:
+            self.max = duration
+            self.example = example
+
+
+class Command(BaseCommand):
+    help = 'Сводка по журналу медленных запросов (core/profiling.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='Файлы журнала; по умолчанию SLOW_LOG_FILE и его ротации.',
+        )
+        parser.add_argument(
+            '--top', type=int, default=10,
+            help='Сколько строк выводить в каждом разделе.',
+        )
+
+    def read_events(self, files):
+        for path in files:
+            with open(path, encoding='utf-8') as log:
+                for line in log:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def handle(self, *args, **options):
+        files = options['files'] or sorted(
+            glob.glob(settings.SLOW_LOG_FILE + '*')
+        )
+        queries = defaultdict(Aggregate)
+        requests = defaultdict(Aggregate)
+        functions = defaultdict(float)
+        for event in self.read_events(files):
+            if event.get('type') == 'query':
+                key = (event.get('site'), event.get('template'),
+                       event.get('fingerprint'))
+                queries[key].add(event['duration'], event.get('params'))
+            elif event.get('type') == 'request':
+                requests[event.get('view')].add(
+                    event['duration'], event.get('path')
+                )
+                for row in event.get('profile', ()):
+                    functions[row['function']] += row['tottime']
+
+        top = options['top']
+        self.stdout.write(self.style.MIGRATE_HEADING('Медленные запросы к БД'))
+        for (site, template, sql), item in sorted(
+            queries.items(), key=lambda pair: pair[1].total, reverse=True,
+        )[:top]:
+            self.stdout.write(
+                f'{item.total:9.3f} с  {item.count:6} шт.  '
+                f'max {item.max:.3f} с  {site or "?"}'
+                + (f'  [{template}]' if template else '')
+            )
+            self.stdout.write('    ' + (sql or '')[:200])
+        self.stdout.write(self.style.MIGRATE_HEADING('Медленные страницы'))
+        for view, item in sorted(
+            requests.items(), key=lambda pair: pair[1].total, reverse=True,
+        )[:top]:
+            self.stdout.write(
+                f'{item.total:9.3f} с  {item.count:6} шт.  '
+                f'avg {item.total / item.count:.3f} с  '
+                f'max {item.max:.3f} с  {view}  ({item.example})'
+            )
+        if functions:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                'Собственное время функций в профилях'
+            ))
+            for function, own in sorted(
+                functions.items(), key=lambda pair: pair[1], reverse=True,
+            )[:top]:
+                self.stdout.write(f'{own:9.3f} с  {function}')
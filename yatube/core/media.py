@@ -0,0 +1,191 @@
+"""Раздача загруженных файлов без отдельного веб-сервера.
+
+``serve`` отдаёт файл через ``FileResponse``: WSGI-сервер с
+``wsgi.file_wrapper`` (gunicorn, uWSGI) передаёт его через ``sendfile``
+без копирования в Python. Поддерживаются ``ETag``/``Last-Modified`` с
+ответами 304 и один диапазон ``Range`` (206). Если перед приложением
+стоит прокси, ``MEDIA_SENDFILE`` перекладывает передачу на него:
+``'x-accel-redirect'`` (nginx, внутренний location ``MEDIA_ACCEL_PREFIX``)
+или ``'x-sendfile'`` (Apache, lighttpd).
+
+Файлы, названные хешем содержимого (см. core/storage.py), не меняются и
+кэшируются навсегда.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .static import IMMUTABLE, MUTABLE
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+ADDRESSED_RE = re.compile(r'(^|/)[0-9a-f]{64}\.\w+$')
+
+
+class _RangeFile:
+    """Файл, из которого читается только ``length`` байт с ``start``.
+
+    ``fileno`` и ``tell`` остаются от исходного файла: ``sendfile``
+    в WSGI-сервере начнёт с текущей позиции и отправит ровно
+    ``Content-Length`` байт.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def _byte_range(header, size):
+    """``(start, end)`` включительно, ``None`` — отдать файл целиком.
+
+    Для невыполнимого диапазона бросает ``ValueError``. Несколько
+    диапазонов сразу не поддерживаются, и по RFC 7233 файл отдаётся
+    целиком.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Суффикс: последние N байт.
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _etag(stat):
+    return '"{}"'.format(hashlib.md5(
+        f'{stat.st_mtime_ns}-{stat.st_size}'.encode()
+    ).hexdigest())
+
+
+def _sendfile_response(path, name):
+    response = HttpResponse()
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_PREFIX + name
+        )
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def _if_range(request, etag, stat):
+    """Выполнять ли ``Range``: ``If-Range`` должен совпадать с файлом."""
+    validator = request.META.get('HTTP_IF_RANGE')
+    if not validator:
+        return True
+    if validator.startswith(('"', 'W/')):
+        return validator == etag
+    date = parse_http_date_safe(validator)
+    return date is not None and date >= int(stat.st_mtime)
+
+
+def _file_response(request, fullpath, stat, etag):
+    size = stat.st_size
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _if_range(request, etag, stat):
+        try:
+            byte_range = _byte_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    if request.method == 'HEAD':
+        response = HttpResponse()
+        length = size
+    elif byte_range is None:
+        response = FileResponse(open(fullpath, 'rb'))
+        length = size
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(
+            _RangeFile(open(fullpath, 'rb'), start, length)
+        )
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response.block_size = BLOCK_SIZE
+    response['Content-Length'] = str(length)
+    return response
+
+
+@require_safe
+def serve(request, path, document_root):
+    try:
+        fullpath = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    etag = _etag(stat)
+    content_type, _ = mimetypes.guess_type(fullpath)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+        'Cache-Control': IMMUTABLE if ADDRESSED_RE.search(path) else MUTABLE,
+        'Accept-Ranges': 'bytes',
+    }
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime),
+    )
+    if response is None:
+        if settings.MEDIA_SENDFILE:
+            # Диапазоны и проверки ещё раз выполнит прокси.
+            response = _sendfile_response(fullpath, path)
+        else:
+            response = _file_response(request, fullpath, stat, etag)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def media_urls(prefix, document_root):
+    """Маршрут к ``serve`` — как ``django.conf.urls.static.static()``,
+    но и при ``DEBUG = False``."""
+    if not prefix or urlsplit(prefix).netloc:
+        return []
+    return [re_path(
+        r'^%s(?P<path>.*)$' % re.escape(prefix.lstrip('/')), serve,
+        {'document_root': document_root},
+    )]
@@ -0,0 +1,225 @@
+"""Метрики производительности в текстовом формате Prometheus.
+
+Метрики копятся в памяти процесса: каждый воркер отдаёт свои значения
+на ``/metrics``, суммирует их уже Prometheus. Статистика текущего запроса
+(запросы к БД, обращения к кэшу, рендер шаблонов) собирается в
+``RequestStats`` через contextvar и разносится по метрикам с меткой имени
+URL в ``core.middleware.MetricsMiddleware``.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+current_stats = ContextVar('current_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = (
+        'queries', 'query_time', 'cache_hits', 'cache_misses',
+        'template_time', 'identity_loads', 'identity_saved',
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.identity_loads = 0
+        self.identity_saved = 0
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - started
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [
+        f'{name}="{_escape(value)}"'
+        for name, value in (*zip(names, values), *extra)
+    ]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def header(self):
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                labels = _format_labels(self.labels, key)
+                lines.append(f'{self.name}{labels} {value}')
+        return lines
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, observed = self._values.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value, observed + 1)
+
+    def get(self, **labels):
+        """Число наблюдений и их сумма."""
+        _, total, observed = self._values.get(
+            self._key(labels), (None, 0.0, 0)
+        )
+        return observed, total
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted(
+                (key, list(counts), total, observed)
+                for key, (counts, total, observed) in self._values.items()
+            )
+        for key, counts, total, observed in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labels, key, [('le', bound)])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, key, [('le', '+Inf')])
+            lines.append(f'{self.name}_bucket{labels} {observed}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {observed}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'yatube_request_duration_seconds',
+    'Время обработки запроса.',
+    labels=('view',),
+))
+REQUESTS = registry.register(Counter(
+    'yatube_requests_total',
+    'Число запросов по статусам ответа.',
+    labels=('view', 'status'),
+))
+DB_QUERIES = registry.register(Counter(
+    'yatube_db_queries_total',
+    'Число запросов к БД.',
+    labels=('view',),
+))
+DB_QUERY_TIME = registry.register(Counter(
+    'yatube_db_query_seconds_total',
+    'Суммарное время запросов к БД.',
+    labels=('view',),
+))
+CACHE_REQUESTS = registry.register(Counter(
+    'yatube_cache_requests_total',
+    'Обращения к кэшу.',
+    labels=('view', 'result'),
+))
+TEMPLATE_RENDER = registry.register(Histogram(
+    'yatube_template_render_seconds',
+    'Время рендера шаблонов за запрос.',
+    labels=('view',),
+))
+LOOKUP_CACHE = registry.register(Counter(
+    'yatube_lookup_cache_requests_total',
+    'Обращения к кэшу выборок по уникальному полю (core/lookup.py).',
+    labels=('model', 'result'),
+))
+FEED_ROW_LOADS = registry.register(Counter(
+    'yatube_feed_row_loads_total',
+    'Загрузки модели целиком из строки ленты (posts/feed.py).',
+    labels=('model', 'attribute'),
+))
+IDENTITY_MAP = registry.register(Counter(
+    'yatube_identity_map_objects_total',
+    'Объекты карты идентичности: загруженные и сэкономленные загрузки.',
+    labels=('view', 'result'),
+))
+
+
+def record_request(view, status, duration, stats):
+    REQUEST_LATENCY.observe(duration, view=view)
+    REQUESTS.inc(view=view, status=status)
+    DB_QUERIES.inc(stats.queries, view=view)
+    DB_QUERY_TIME.inc(stats.query_time, view=view)
+    if stats.cache_hits:
+        CACHE_REQUESTS.inc(stats.cache_hits, view=view, result='hit')
+    if stats.cache_misses:
+        CACHE_REQUESTS.inc(stats.cache_misses, view=view, result='miss')
+    if stats.template_time:
+        TEMPLATE_RENDER.observe(stats.template_time, view=view)
+    if stats.identity_loads:
+        IDENTITY_MAP.inc(stats.identity_loads, view=view, result='loaded')
+    if stats.identity_saved:
+        IDENTITY_MAP.inc(stats.identity_saved, view=view, result='saved')
@@ -0,0 +1,87 @@
+import cProfile
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .identity import IdentityMap, current_map
+from .metrics import RequestStats, current_stats, record_request
+from .profiling import log_slow_request, slow_query_wrapper
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса с меткой имени URL (``posts:index``)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats.query_wrapper):
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        match = request.resolver_match
+        view = match.view_name if match is not None else '<unresolved>'
+        record_request(
+            view, response.status_code, time.perf_counter() - started, stats,
+        )
+        return response
+
+
+class SlowRequestMiddleware:
+    """Пишет в журнал медленные запросы к БД и медленные HTTP-запросы.
+
+    Доля ``PROFILE_SAMPLE_RATE`` запросов выполняется под cProfile,
+    профиль сохраняется только у медленных.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profiler = None
+        if random.random() < settings.PROFILE_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with connection.execute_wrapper(slow_query_wrapper):
+            if profiler is None:
+                response = self.get_response(request)
+            else:
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+        duration = time.perf_counter() - started
+        if duration >= settings.SLOW_REQUEST_THRESHOLD:
+            log_slow_request(request, duration, profiler)
+        return response
+
+
+class IdentityMapMiddleware:
+    """Заводит карту идентичности на запрос (см. ``core/identity.py``)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        identity = IdentityMap()
+        token = current_map.set(identity)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_map.reset(token)
+        stats = current_stats.get()
+        if stats is not None:
+            stats.identity_loads += identity.loads
+            stats.identity_saved += identity.saved
+        if settings.DEBUG:
+            response['X-Identity-Map'] = (
+                f'loads={identity.loads}; saved={identity.saved}'
+            )
+        return response
@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class StoredFile(models.Model):
+    """Файл в хранилище с адресацией по содержимому (core/storage.py)."""
+
+    name = models.CharField('Имя файла', max_length=255, unique=True)
+    references = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
@@ -0,0 +1,40 @@
+"""Пагинатор без ``COUNT(*)`` по большим таблицам.
+
+На PostgreSQL подсчёт всех строк — полный проход по таблице. Для выборки
+без условий ``EstimatedCountPaginator`` берёт оценку числа строк из
+статистики планировщика (``pg_class.reltuples``), которую обновляет
+autovacuum. Маленькие таблицы, выборки с фильтрами и другие СУБД
+считаются как обычно.
+"""
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Меньше этого числа строк точный подсчёт достаточно дешёв.
+ESTIMATE_THRESHOLD = 100000
+
+
+def estimated_count(queryset):
+    """Оценка числа строк таблицы модели или ``None``, если её нет."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
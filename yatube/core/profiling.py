@@ -0,0 +1,129 @@
+"""Журнал медленных запросов к БД и медленных HTTP-запросов.
+
+Для каждого запроса к БД дольше ``SLOW_QUERY_THRESHOLD`` пишется SQL,
+параметры, длительность, место вызова в коде проекта и тег шаблона, из
+которого он был сделан. Доля ``PROFILE_SAMPLE_RATE`` запросов выполняется
+под cProfile; профиль попадает в журнал, только если запрос оказался
+медленнее ``SLOW_REQUEST_THRESHOLD``. Записи — JSON-строки в логгере
+``yatube.slow``; сводку по ним строит команда ``slow_report``.
+"""
+import logging
+import os
+import pstats
+import re
+import sys
+import time
+
+import django
+from django.conf import settings
+
+logger = logging.getLogger('yatube.slow')
+
+PROFILE_LIMIT = 30
+PARAMS_LIMIT = 500
+
+_TEMPLATE_BASE = os.path.join(
+    os.path.dirname(os.path.abspath(django.__file__)), 'template', 'base.py'
+)
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+
+def fingerprint(sql):
+    """SQL без литералов: запросы, отличающиеся параметрами, совпадают."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    return _LISTS.sub('(...)', sql)
+
+
+# Модули самой инструментации в место вызова не попадают.
+_INSTRUMENTATION = tuple(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('cache.py', 'metrics.py', 'middleware.py', 'profiling.py',
+                 'template.py')
+)
+
+
+def _project_file(filename):
+    return (
+        filename.startswith(settings.BASE_DIR)
+        and filename not in _INSTRUMENTATION
+        and 'site-packages' not in filename
+        and os.sep + 'tests' + os.sep not in filename
+    )
+
+
+def call_site(frame):
+    """Ближайший вызов из кода проекта и тег шаблона, если он есть."""
+    site = template = None
+    while frame is not None and (site is None or template is None):
+        code = frame.f_code
+        if site is None and _project_file(code.co_filename):
+            relative = os.path.relpath(code.co_filename, settings.BASE_DIR)
+            site = f'{relative}:{frame.f_lineno} ({code.co_name})'
+        if (
+            template is None
+            and code.co_name == 'render_annotated'
+            and code.co_filename == _TEMPLATE_BASE
+        ):
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = (
+                    f'{origin.template_name}:{token.lineno} '
+                    f'{{% {token.contents.split()[0]} %}}'
+                )
+        frame = frame.f_back
+    return site, template
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        if duration >= settings.SLOW_QUERY_THRESHOLD:
+            site, template = call_site(sys._getframe(1))
+            logger.warning('slow query', extra={'event': {
+                'type': 'query',
+                'duration': round(duration, 6),
+                'sql': sql,
+                'fingerprint': fingerprint(sql),
+                'params': repr(params)[:PARAMS_LIMIT],
+                'many': many,
+                'site': site,
+                'template': template,
+            }})
+
+
+def profile_summary(profiler, limit=PROFILE_LIMIT):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), values in stats.stats.items():
+        calls, _, own, cumulative, _ = values
+        rows.append({
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'tottime': round(own, 6),
+            'cumtime': round(cumulative, 6),
+        })
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:limit]
+
+
+def log_slow_request(request, duration, profiler=None):
+    match = request.resolver_match
+    event = {
+        'type': 'request',
+        'duration': round(duration, 6),
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match is not None else None,
+    }
+    if profiler is not None:
+        event['profile'] = profile_summary(profiler)
+    logger.warning('slow request', extra={'event': event})
@@ -0,0 +1,144 @@
+"""Удаление из CSS правил, классы которых не встречаются в шаблонах.
+
+Словарь используемых слов собирается из всех шаблонов и модулей проекта
+(с запасом: любое слово из букв, цифр, ``-`` и ``_``). Селектор остаётся,
+если все его классы есть в словаре; правило пропадает, когда из него
+ушли все селекторы. ``@keyframes``, ``@font-face`` и прочие at-правила
+без вложенных селекторов сохраняются целиком.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.template.utils import get_app_template_dirs
+
+WORDS = re.compile(r'[A-Za-z0-9_-]+')
+CLASSES = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+ATTRIBUTES = re.compile(r'\[[^\]]*\]')
+# At-правила, внутри которых лежат обычные правила со селекторами.
+NESTED_AT_RULES = ('@media', '@supports', '@document')
+
+
+def _source_files():
+    dirs = []
+    for engine in settings.TEMPLATES:
+        dirs.extend(engine.get('DIRS', ()))
+    dirs.extend(get_app_template_dirs('templates'))
+    for directory in dirs:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                yield os.path.join(root, name)
+    for root, subdirs, files in os.walk(settings.BASE_DIR):
+        subdirs[:] = [
+            name for name in subdirs
+            if name not in ('static', 'media', 'migrations', 'logs', 'tests')
+            and not name.startswith('.')
+        ]
+        for name in files:
+            if name.endswith('.py') and name != 'tests.py':
+                yield os.path.join(root, name)
+
+
+def used_words():
+    words = set(getattr(settings, 'PURGE_CSS_SAFELIST', ()))
+    for path in _source_files():
+        with open(path, encoding='utf-8', errors='ignore') as source:
+            words.update(WORDS.findall(source.read()))
+    return words
+
+
+def _skip_string(css, index):
+    quote = css[index]
+    index += 1
+    while index < len(css) and css[index] != quote:
+        index += 2 if css[index] == '\\' else 1
+    return index + 1
+
+
+def _block_end(css, start):
+    """Индекс закрывающей скобки блока, открытого на ``start``."""
+    depth = 0
+    index = start
+    while index < len(css):
+        char = css[index]
+        if char in '"\'':
+            index = _skip_string(css, index)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return index
+        index += 1
+    return len(css)
+
+
+def _statements(css):
+    """Пары (прелюдия, тело) верхнего уровня; у ``@charset`` тела нет."""
+    index = 0
+    while index < len(css):
+        if css.startswith('/*', index):
+            end = css.find('*/', index + 2)
+            end = len(css) if end == -1 else end + 2
+            if css.startswith('/*!', index):
+                yield css[index:end], None
+            index = end
+            continue
+        if css[index].isspace():
+            index += 1
+            continue
+        start = index
+        while index < len(css) and css[index] not in '{;':
+            if css[index] in '"\'':
+                index = _skip_string(css, index)
+            else:
+                index += 1
+        if index >= len(css) or css[index] == ';':
+            yield css[start:index + 1], None
+            index += 1
+            continue
+        end = _block_end(css, index)
+        yield css[start:index].strip(), css[index + 1:end]
+        index = end + 1
+
+
+def _split_selectors(prelude):
+    depth = 0
+    start = 0
+    for index, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            yield prelude[start:index]
+            start = index + 1
+    yield prelude[start:]
+
+
+def _keep_selector(selector, words):
+    selector = ATTRIBUTES.sub('', selector)
+    return all(name in words for name in CLASSES.findall(selector))
+
+
+def purge(css, words):
+    output = []
+    for prelude, body in _statements(css):
+        if body is None:
+            output.append(prelude)
+        elif prelude.startswith('@'):
+            if prelude.startswith(NESTED_AT_RULES):
+                inner = purge(body, words)
+                if inner:
+                    output.append(f'{prelude}{{{inner}}}')
+            else:
+                output.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = [
+                selector for selector in _split_selectors(prelude)
+                if _keep_selector(selector, words)
+            ]
+            if selectors:
+                output.append(f'{",".join(selectors)}{{{body}}}')
+    return ''.join(output)
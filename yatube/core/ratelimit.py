@@ -0,0 +1,50 @@
+"""Ограничение частоты действий по алгоритму token bucket.
+
+Состояние корзины (число жетонов и время последнего пополнения) хранится
+в общем кэше, поэтому лимит действует на все процессы, которые этот кэш
+разделяют. Чтение и запись корзины идут под блокировкой на ``cache.add``:
+иначе одновременные запросы прочитали бы одно и то же число жетонов и
+прошли бы все.
+"""
+import time
+from urllib.parse import quote
+
+from django.core.cache import cache
+
+KEY = 'ratelimit:{scope}:{ident}'
+# Сколько секунд блокировка живёт, если процесс упал, не сняв её, и
+# сколько её ждать; не дождавшийся запрос считается сверх лимита.
+LOCK_TIMEOUT = 1
+LOCK_WAIT = 0.5
+
+
+def _acquire(lock):
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock, True, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def consume(scope, ident, capacity, period, cost=1, now=None):
+    """Забирает ``cost`` жетонов; ``False``, если их не хватает.
+
+    Корзина вмещает ``capacity`` жетонов и заполняется целиком за
+    ``period`` секунд.
+    """
+    now = time.time() if now is None else now
+    key = KEY.format(scope=scope, ident=quote(str(ident)))
+    lock = key + ':lock'
+    if not _acquire(lock):
+        return False
+    try:
+        tokens, updated = cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * capacity / period)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        cache.set(key, (tokens, now), period)
+    finally:
+        cache.delete(lock)
+    return allowed
@@ -0,0 +1,189 @@
+"""Сборка и раздача статики.
+
+``collectstatic`` с ``CompressedManifestStaticFilesStorage`` вырезает из
+CSS из ``PURGE_CSS`` неиспользуемые правила, даёт файлам имена с хешем
+содержимого и кладёт рядом сжатые копии ``.gz`` (и ``.br``, если
+установлен пакет ``brotli``). ``StaticFilesApplication`` отдаёт собранные
+файлы прямо из WSGI-приложения: файлы с хешем в имени кэшируются навсегда.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from email.utils import formatdate
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+from .purgecss import purge, used_words
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_EXTENSIONS = (
+    '.css', '.js', '.svg', '.ico', '.txt', '.html', '.json', '.xml', '.map',
+)
+# Сжатая копия сохраняется, только если она заметно меньше оригинала.
+MIN_COMPRESSION = 0.95
+IMMUTABLE = 'public, max-age=31536000, immutable'
+MUTABLE = 'public, max-age=60'
+BLOCK_SIZE = 64 * 1024
+
+
+def _compressors():
+    yield '.gz', lambda data: gzip.compress(data, 9, mtime=0)
+    if brotli is not None:
+        yield '.br', brotli.compress
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def stored_name(self, name):
+        # До первого collectstatic (разработка, тесты) манифеста нет.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def purge_css(self, paths):
+        """Урезает собранные CSS до хеширования.
+
+        Хеш и копия с хешем в имени делаются из ``paths[name]`` — файла
+        в исходном хранилище, поэтому он подменяется урезанной копией.
+        """
+        words = None
+        for name in getattr(settings, 'PURGE_CSS', ()):
+            if name not in paths:
+                continue
+            if words is None:
+                words = used_words()
+            with self.open(name) as original:
+                css = original.read().decode('utf-8')
+            self.delete(name)
+            self._save(name, ContentFile(purge(css, words).encode('utf-8')))
+            paths[name] = (self, name)
+
+    def compress(self, name):
+        with self.open(name) as original:
+            data = original.read()
+        for suffix, compressor in _compressors():
+            compressed = compressor(data)
+            if len(compressed) < len(data) * MIN_COMPRESSION:
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = dict(paths)
+            self.purge_css(paths)
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESS_EXTENSIONS) and self.exists(name):
+                self.compress(name)
+
+
+def _etag(path, encoding):
+    # У каждой кодировки свой ETag: иначе кэш, получивший 304 на
+    # сжатую копию, мог бы отдать её клиенту без поддержки сжатия.
+    stat = os.stat(path)
+    return '"{}"'.format(hashlib.md5(
+        f'{encoding or "identity"}-{stat.st_mtime_ns}-{stat.st_size}'.encode()
+    ).hexdigest())
+
+
+class StaticFile:
+    __slots__ = ('variants', 'headers')
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(path)
+        self.headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Cache-Control', IMMUTABLE if immutable else MUTABLE),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+        ]
+        self.variants = []
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if os.path.exists(path + suffix):
+                self.variants.append(
+                    (encoding, path + suffix, _etag(path + suffix, encoding))
+                )
+        self.variants.append((None, path, _etag(path, None)))
+        if len(self.variants) > 1:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def choose(self, accept_encoding):
+        """``(кодировка, путь, ETag)`` варианта для ``Accept-Encoding``."""
+        accepted = {
+            part.split(';')[0].strip() for part in accept_encoding.split(',')
+        }
+        for variant in self.variants:
+            if variant[0] is None or variant[0] in accepted:
+                return variant
+
+
+class StaticFilesApplication:
+    """WSGI-обёртка, отдающая файлы из ``STATIC_ROOT`` до Django.
+
+    Список файлов читается один раз при старте, поэтому после
+    ``collectstatic`` приложение нужно перезапустить.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.prefix = settings.STATIC_URL
+        self.files = self.scan(settings.STATIC_ROOT)
+
+    def scan(self, root):
+        files = {}
+        if not root or not os.path.isdir(root):
+            return files
+        hashed = set()
+        manifest = os.path.join(root, 'staticfiles.json')
+        if os.path.exists(manifest):
+            storage = CompressedManifestStaticFilesStorage(location=root)
+            hashed = set(storage.hashed_files.values())
+        for directory, _, names in os.walk(root):
+            for filename in names:
+                if filename.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                files[self.prefix + name] = StaticFile(path, name in hashed)
+        return files
+
+    def __call__(self, environ, start_response):
+        static = self.files.get(environ.get('PATH_INFO', ''))
+        if static is None:
+            return self.application(environ, start_response)
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+            return []
+        encoding, path, etag = static.choose(
+            environ.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        headers = [*static.headers, ('ETag', etag)]
+        if environ.get('HTTP_IF_NONE_MATCH') == etag:
+            start_response('304 Not Modified', headers)
+            return []
+        headers.append(('Content-Length', str(os.path.getsize(path))))
+        if encoding is not None:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(open(path, 'rb'), BLOCK_SIZE)
+        return _read_blocks(path)
+
+
+def _read_blocks(path):
+    with open(path, 'rb') as file:
+        yield from iter(lambda: file.read(BLOCK_SIZE), b'')
@@ -0,0 +1,298 @@
+"""Хранилища файлов проекта.
+
+``ContentAddressedStorage`` (основное хранилище) кладёт загрузки из
+каталогов ``CONTENT_ADDRESSED_PREFIXES`` по хешу содержимого:
+``posts/ab/cd/abcd….jpg``. Одинаковые файлы хранятся один раз, а число
+ссылок на файл ведётся в ``core.models.StoredFile``: ``release`` уменьшает
+его и удаляет файл, когда ссылок не осталось, — после коммита
+транзакции, чтобы откат не оставил строку без файла. Прочие файлы
+(например, миниатюры sorl-thumbnail) сохраняются как обычно.
+
+``InMemoryStorage`` — то же самое в памяти процесса, для тестов.
+
+``ArchiveStorage`` — хранилище картинок архивных постов.
+"""
+import hashlib
+import posixpath
+from functools import partial
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import (FileSystemStorage, Storage,
+                                       default_storage)
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import filepath_to_uri
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+from .models import StoredFile
+
+CHUNK_SIZE = 64 * 1024
+
+
+def default():
+    """Текущее ``default_storage`` там, где ждут путь к классу хранилища.
+
+    ``THUMBNAIL_STORAGE`` указывает сюда, чтобы миниатюры писались туда
+    же, куда и картинки, — в том числе при подмене хранилища в тестах.
+    """
+    return default_storage
+
+
+def release(storage, name):
+    """Отпускает ссылку на файл, если хранилище считает ссылки."""
+    if name and hasattr(storage, 'release'):
+        storage.release(name)
+
+
+class ContentAddressedMixin:
+
+    def prefix(self, name):
+        for prefix in settings.CONTENT_ADDRESSED_PREFIXES:
+            if name.startswith(prefix):
+                return prefix
+        return None
+
+    def is_addressed(self, name):
+        return self.prefix(name) is not None
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        # Каталог — сам префикс, а не каталог исходного имени: иначе
+        # повторное сохранение уже адресованного файла (например, при
+        # загрузке выгрузки) вложило бы шарды друг в друга.
+        return posixpath.join(
+            self.prefix(name), digest[:2], digest[2:4],
+            digest + posixpath.splitext(name)[1].lower(),
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = name.replace('\\', '/')
+        if not self.is_addressed(name):
+            return super().save(name, content, max_length)
+        name = self.content_name(name, content)
+        with transaction.atomic():
+            stored, _ = (
+                StoredFile.objects.select_for_update()
+                .get_or_create(name=name)
+            )
+            if not self.exists(name):
+                self._save(name, content)
+            StoredFile.objects.filter(pk=stored.pk).update(
+                references=F('references') + 1
+            )
+        return name
+
+    def release(self, name):
+        if not self.is_addressed(name):
+            return
+        with transaction.atomic():
+            stored = (
+                StoredFile.objects.select_for_update()
+                .filter(name=name).first()
+            )
+            # Файлы без учёта ссылок (загруженные до этого хранилища)
+            # не трогаются: их собирает команда очистки медиа.
+            if stored is None:
+                return
+            if stored.references > 1:
+                StoredFile.objects.filter(pk=stored.pk).update(
+                    references=F('references') - 1
+                )
+                return
+            stored.delete()
+            transaction.on_commit(partial(self._delete_unreferenced, name))
+
+    def _delete_unreferenced(self, name):
+        # Пока транзакция шла, тот же файл могли загрузить снова.
+        with transaction.atomic():
+            if not StoredFile.objects.select_for_update().filter(
+                name=name,
+            ).exists():
+                self.delete(name)
+
+
+@deconstructible
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    pass
+
+
+@deconstructible
+class MemoryStorage(Storage):
+    """Файлы в словаре, общем для всех экземпляров в процессе."""
+
+    files = {}
+
+    def _open(self, name, mode='rb'):
+        try:
+            content, _ = self.files[name]
+        except KeyError:
+            raise FileNotFoundError(name)
+        return ContentFile(content, name=name)
+
+    def _save(self, name, content):
+        content.seek(0)
+        self.files[name] = (b''.join(content.chunks()), timezone.now())
+        return name
+
+    def delete(self, name):
+        self.files.pop(name, None)
+
+    def exists(self, name):
+        return name in self.files
+
+    def size(self, name):
+        try:
+            return len(self.files[name][0])
+        except KeyError:
+            raise FileNotFoundError(name)
+
+    def listdir(self, path):
+        prefix = path.rstrip('/') + '/' if path else ''
+        directories, files = set(), []
+        for name in self.files:
+            if not name.startswith(prefix):
+                continue
+            head, sep, _ = name[len(prefix):].partition('/')
+            if sep:
+                directories.add(head)
+            else:
+                files.append(head)
+        return sorted(directories), sorted(files)
+
+    def url(self, name):
+        return urljoin(settings.MEDIA_URL, filepath_to_uri(name))
+
+    def get_modified_time(self, name):
+        try:
+            return self.files[name][1]
+        except KeyError:
+            raise FileNotFoundError(name)
+
+    get_created_time = get_accessed_time = get_modified_time
+
+
+@deconstructible
+class InMemoryStorage(ContentAddressedMixin, MemoryStorage):
+    pass
+
+
+@deconstructible
+class InMemoryArchiveStorage(MemoryStorage):
+    """Архив в памяти процесса, отдельно от ``InMemoryStorage``, для тестов."""
+
+    files = {}
+
+    def url(self, name):
+        return urljoin(
+            getattr(settings, 'ARCHIVE_MEDIA_URL', None) or settings.MEDIA_URL,
+            filepath_to_uri(name),
+        )
+
+
+@deconstructible
+class ArchiveStorage(Storage):
+    """Холодное хранилище картинок архивных постов.
+
+    Файлы хранит ``ARCHIVE_FILE_STORAGE``, если он задан, иначе каталог
+    ``ARCHIVE_MEDIA_ROOT`` с URL ``ARCHIVE_MEDIA_URL``. Если не задано ни
+    то ни другое, архив — это ``default_storage``: картинки остаются на
+    месте, и архивные посты держат ссылки на них.
+    """
+
+    SETTINGS = (
+        'ARCHIVE_FILE_STORAGE', 'ARCHIVE_MEDIA_ROOT', 'ARCHIVE_MEDIA_URL',
+        'DEFAULT_FILE_STORAGE',
+    )
+
+    def __init__(self):
+        setting_changed.connect(self._clear_backend)
+
+    def _clear_backend(self, setting, **kwargs):
+        if setting in self.SETTINGS:
+            self.__dict__.pop('backend', None)
+
+    @property
+    def separate(self):
+        return bool(
+            getattr(settings, 'ARCHIVE_FILE_STORAGE', None)
+            or getattr(settings, 'ARCHIVE_MEDIA_ROOT', None)
+        )
+
+    @cached_property
+    def backend(self):
+        path = getattr(settings, 'ARCHIVE_FILE_STORAGE', None)
+        if path:
+            return import_string(path)()
+        if getattr(settings, 'ARCHIVE_MEDIA_ROOT', None):
+            return FileSystemStorage(
+                settings.ARCHIVE_MEDIA_ROOT,
+                getattr(settings, 'ARCHIVE_MEDIA_URL', None)
+                or settings.MEDIA_URL,
+            )
+        return default_storage
+
+    def release(self, name):
+        """Отпускает картинку удалённого архивного поста.
+
+        Отдельный архив хранит свою копию для каждого поста, поэтому она
+        удаляется после коммита; общий с постами — считает ссылки.
+        """
+        if not name:
+            return
+        if not self.separate:
+            release(self.backend, name)
+        elif hasattr(self.backend, 'release'):
+            self.backend.release(name)
+        else:
+            transaction.on_commit(partial(self.backend.delete, name))
+
+    def open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def save(self, name, content, max_length=None):
+        return self.backend.save(name, content, max_length)
+
+    def delete(self, name):
+        self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+archive_storage = ArchiveStorage()
@@ -0,0 +1,26 @@
+"""Шаблонный бэкенд Django, замеряющий время рендера для метрик."""
+import time
+
+from django.template.backends.django import DjangoTemplates as BaseBackend
+from django.template.backends.django import Template as BaseTemplate
+
+from .metrics import current_stats
+
+
+class Template(BaseTemplate):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats = current_stats.get()
+            if stats is not None:
+                stats.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(BaseBackend):
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,424 @@
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+
+from core.identity import attach
+from core.logs import JsonFormatter
+from core.media import serve
+from core.metrics import (CACHE_REQUESTS, DB_QUERIES, IDENTITY_MAP,
+                          REQUEST_LATENCY, TEMPLATE_RENDER)
+from core.middleware import IdentityMapMiddleware
+from core.models import StoredFile
+from core.ratelimit import consume
+from core.static import IMMUTABLE, StaticFilesApplication
+from core.storage import InMemoryStorage
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Текст поста')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_request_metrics_tagged_by_url_name(self):
+        """Задержка, запросы к БД, кэш и шаблоны учитываются по имени URL."""
+        view = 'posts:index'
+        requests, _ = REQUEST_LATENCY.get(view=view)
+        queries = DB_QUERIES.get(view=view)
+        renders, _ = TEMPLATE_RENDER.get(view=view)
+        hits = CACHE_REQUESTS.get(view=view, result='hit')
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(REQUEST_LATENCY.get(view=view)[0], requests + 2)
+        self.assertGreater(DB_QUERIES.get(view=view), queries)
+        self.assertEqual(TEMPLATE_RENDER.get(view=view)[0], renders + 1)
+        self.assertGreater(CACHE_REQUESTS.get(view=view, result='hit'), hits)
+
+    def test_metrics_endpoint(self):
+        """Метрики отдаются в текстовом формате Prometheus."""
+        self.client.get(reverse('about:author'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response,
+            'yatube_request_duration_seconds_count{view="about:author"}',
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_endpoint_is_private(self):
+        """Посторонним адресам метрики не отдаются."""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+
+class IdentityMapTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=author, text='Комментарий')
+            for author in (cls.author, cls.reader) * 3
+        )
+
+    def test_post_detail_loads_each_user_once(self):
+        """Автор поста, комментаторы и request.user — по экземпляру."""
+        view = 'posts:post_detail'
+        loaded = IDENTITY_MAP.get(view=view, result='loaded')
+        saved = IDENTITY_MAP.get(view=view, result='saved')
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(
+            reverse(view, kwargs={'post_id': self.post.pk})
+        )
+        post = response.context['post']
+        comments = response.context['comments']
+        authors = {id(comment.author) for comment in comments}
+        self.assertEqual(len(authors), 2)
+        self.assertIn(id(post.author), authors)
+        self.assertIs(post.author, response.context['request'].user._wrapped)
+        # Загружены пост, request.user и reader, автор поста и 5
+        # комментариев — из карты.
+        self.assertEqual(
+            IDENTITY_MAP.get(view=view, result='loaded'), loaded + 3,
+        )
+        self.assertEqual(
+            IDENTITY_MAP.get(view=view, result='saved'), saved + 6,
+        )
+
+    @override_settings(DEBUG=True)
+    def test_debug_header(self):
+        """При DEBUG сэкономленные загрузки видны в заголовке ответа."""
+        def view(request):
+            attach(Comment.objects.all(), 'author')
+            return HttpResponse()
+
+        middleware = IdentityMapMiddleware(view)
+        response = middleware(RequestFactory().get('/'))
+        self.assertEqual(response['X-Identity-Map'], 'loads=2; saved=4')
+
+
+slow_log_everything = override_settings(
+    SLOW_QUERY_THRESHOLD=0,
+    SLOW_REQUEST_THRESHOLD=0,
+    PROFILE_SAMPLE_RATE=1,
+)
+
+
+class SlowLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Текст поста')
+        cls.url = reverse('posts:profile', kwargs={'username': 'auth'})
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    @slow_log_everything
+    def test_slow_queries_attributed(self):
+        """Медленный запрос привязан к месту вызова и тегу шаблона."""
+        with self.assertLogs('yatube.slow') as logs:
+            self.client.get(self.url)
+        events = [record.event for record in logs.records]
+        queries = [event for event in events if event['type'] == 'query']
+        sites = {event['site'].split(':')[0] for event in queries}
+        self.assertIn('posts/views.py', sites)
+        self.assertTrue(any(
+            event['template'] and 'posts/profile.html' in event['template']
+            for event in queries
+        ))
+        request = events[-1]
+        self.assertEqual(request['type'], 'request')
+        self.assertEqual(request['view'], 'posts:profile')
+        self.assertTrue(request['profile'])
+
+    @slow_log_everything
+    def test_report(self):
+        """Команда slow_report агрегирует журнал по месту вызова."""
+        with self.assertLogs('yatube.slow') as logs:
+            self.client.get(self.url)
+            self.client.get(self.url)
+        formatter = JsonFormatter()
+        with tempfile.NamedTemporaryFile('w', suffix='.log') as log:
+            for record in logs.records:
+                log.write(formatter.format(record) + '\n')
+            log.flush()
+            out = StringIO()
+            call_command('slow_report', log.name, stdout=out)
+        self.assertIn('posts/views.py', out.getvalue())
+        self.assertIn('posts:profile', out.getvalue())
+
+    def test_report_without_sql(self):
+        """Запись запроса без текста SQL не ломает отчёт."""
+        with tempfile.NamedTemporaryFile('w', suffix='.log') as log:
+            log.write(json.dumps({'type': 'query', 'duration': 1.5}) + '\n')
+            log.flush()
+            out = StringIO()
+            call_command('slow_report', log.name, stdout=out)
+        self.assertIn('1.500', out.getvalue())
+
+
+class StaticPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.settings = override_settings(STATIC_ROOT=cls.static_root.name)
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.static_root.cleanup()
+        super().tearDownClass()
+
+    def request(self, path, **environ):
+        def not_found(environ, start_response):
+            start_response('404 Not Found', [])
+            return [b'django']
+
+        status = []
+        application = StaticFilesApplication(not_found)
+        body = b''.join(application(
+            {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', **environ},
+            lambda code, headers: status.append((code, dict(headers))),
+        ))
+        return status[0][0], status[0][1], body
+
+    def test_hashed_css_is_purged_and_compressed(self):
+        """Bootstrap собран с хешем в имени, урезан и сжат."""
+        url = staticfiles_storage.url('css/bootstrap.min.css')
+        self.assertRegex(url, r'bootstrap\.min\.[0-9a-f]{12}\.css$')
+        status, headers, body = self.request(
+            url, HTTP_ACCEPT_ENCODING='gzip, deflate',
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        name = staticfiles_storage.stored_name('css/bootstrap.min.css')
+        self.assertNotEqual(name, 'css/bootstrap.min.css')
+        with staticfiles_storage.open(name) as css:
+            purged = css.read()
+        self.assertIn(b'.navbar', purged)
+        self.assertNotIn(b'.carousel', purged)
+        self.assertEqual(len(purged), staticfiles_storage.size(
+            'css/bootstrap.min.css'
+        ))
+
+    def test_validators_and_fallthrough(self):
+        """ETag даёт 304, неизвестные пути уходят в Django."""
+        url = staticfiles_storage.url('img/fav/favicon.ico')
+        status, headers, _ = self.request(url)
+        self.assertEqual(status, '200 OK')
+        status, _, _ = self.request(url, HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual(status, '304 Not Modified')
+        status, _, body = self.request('/static/missing.css')
+        self.assertEqual(body, b'django')
+
+    def test_etag_per_encoding(self):
+        """Сжатая и несжатая копии отдаются с разными ETag."""
+        url = staticfiles_storage.url('css/bootstrap.min.css')
+        _, gzipped, _ = self.request(url, HTTP_ACCEPT_ENCODING='gzip')
+        _, identity, _ = self.request(url)
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertNotEqual(gzipped['ETag'], identity['ETag'])
+        status, _, _ = self.request(url, HTTP_IF_NONE_MATCH=gzipped['ETag'])
+        self.assertEqual(status, '200 OK')
+
+    def test_favicon_link(self):
+        """Фавиконка подключается через static."""
+        response = self.client.get(reverse('about:author'))
+        self.assertContains(
+            response, staticfiles_storage.url('img/fav/favicon.ico')
+        )
+
+
+class RateLimitTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_requests_share_bucket(self):
+        """Одновременные запросы не проходят сверх ёмкости корзины."""
+        allowed = []
+
+        def take():
+            allowed.append(consume('test', 'user', 3, 60, now=0))
+
+        threads = [threading.Thread(target=take) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(allowed.count(True), 3)
+        self.assertTrue(consume('test', 'user', 3, 60, now=20))
+
+
+class ContentAddressedStorageTest(TransactionTestCase):
+    # Файлы удаляются в on_commit, а TestCase транзакции не коммитит.
+
+    def setUp(self):
+        self.storage = InMemoryStorage()
+
+    def test_same_content_stored_once(self):
+        """Одинаковое содержимое хранится одним файлом со счётчиком ссылок."""
+        first = self.storage.save('posts/a.JPG', ContentFile(b'image'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'image'))
+        self.assertEqual(first, second)
+        self.assertRegex(
+            first, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$',
+        )
+        self.assertEqual(StoredFile.objects.get(name=first).references, 2)
+        self.assertEqual(
+            self.storage.save(first, ContentFile(b'image')), first,
+        )
+        for _ in range(3):
+            self.assertTrue(self.storage.exists(first))
+            self.storage.release(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(StoredFile.objects.filter(name=first).exists())
+
+    def test_release_rolled_back(self):
+        """Откат транзакции не удаляет файл, на который осталась ссылка."""
+        name = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.storage.release(name)
+            raise RuntimeError
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+
+    @override_settings(DEFAULT_FILE_STORAGE='core.storage.InMemoryStorage')
+    def test_reupload_of_same_image(self):
+        """Повторная загрузка той же картинки не оставляет лишних ссылок."""
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(
+            author=user, text='Пост', image=ContentFile(b'image', 'a.jpg'),
+        )
+        name = post.image.name
+        post.image = ContentFile(b'image', 'b.jpg')
+        post.save()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        post.delete()
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        self.assertFalse(self.storage.exists(name))
+
+    def test_other_names_stored_plainly(self):
+        """Файлы вне CONTENT_ADDRESSED_PREFIXES сохраняются как обычно."""
+        name = self.storage.save('cache/a.jpg', ContentFile(b'thumb'))
+        self.assertEqual(name, 'cache/a.jpg')
+        self.storage.release(name)
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+
+
+class MediaServeTest(SimpleTestCase):
+    name = 'posts/' + 'a' * 64 + '.jpg'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(cls.root.name, 'posts'))
+        with open(os.path.join(cls.root.name, cls.name), 'wb') as file:
+            file.write(b'0123456789')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.root.cleanup()
+        super().tearDownClass()
+
+    def get(self, path=None, method='get', **headers):
+        request = getattr(RequestFactory(), method)('/media/', **headers)
+        return serve(request, path or self.name, self.root.name)
+
+    def test_full_file(self):
+        """Файл отдаётся целиком с валидаторами и вечным кэшем."""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+        self.assertEqual(self.get(method='head').content, b'')
+
+    def test_ranges(self):
+        """Один диапазон даёт 206, невыполнимый — 416."""
+        for header, body, content_range in (
+            ('bytes=2-5', b'2345', 'bytes 2-5/10'),
+            ('bytes=7-', b'789', 'bytes 7-9/10'),
+            ('bytes=-3', b'789', 'bytes 7-9/10'),
+            ('bytes=8-100', b'89', 'bytes 8-9/10'),
+        ):
+            with self.subTest(header=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    b''.join(response.streaming_content), body,
+                )
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+        response = self.get(HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+        response = self.get(HTTP_RANGE='bytes=0-1,4-5')
+        self.assertEqual(response.status_code, 200)
+        response = self.get(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional(self):
+        """Совпавший ETag или неизменённая дата дают 304."""
+        response = self.get()
+        etag, modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.get(HTTP_IF_MODIFIED_SINCE=modified).status_code, 304,
+        )
+
+    def test_missing_and_outside_root(self):
+        """Отсутствующие файлы, каталоги и пути вне корня — 404."""
+        for path in ('posts/missing.jpg', 'posts', '../etc/passwd'):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.get(path)
+
+    def test_proxy_sendfile(self):
+        """При MEDIA_SENDFILE тело отдаёт прокси."""
+        with self.settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.get()
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/' + self.name,
+        )
+        self.assertEqual(response.content, b'')
+        with self.settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.get()
+        self.assertEqual(
+            response['X-Sendfile'], os.path.join(self.root.name, self.name),
+        )
@@ -0,0 +1,87 @@
+"""Бэкенд sorl-thumbnail, которому размер картинки известен заранее.
+
+При промахе хранилища ключей sorl открывает исходник, чтобы узнать его
+размер, и готовую миниатюру — чтобы узнать её размер. Если размеры
+исходника сохранены в базе (``ImageMetadata``: поля ``image_width`` и
+``image_height`` модели файла или ``stored_size`` строки ленты), уже
+построенная миниатюра регистрируется без чтения файлов: её размер
+считается так же, как его получает движок sorl при масштабировании и
+обрезке. Строит недостающие миниатюры по-прежнему sorl.
+"""
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.helpers import toint
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+# Параметры, с которыми размер миниатюры не выводится из размера исходника.
+UNPREDICTABLE = ('cropbox', 'padding', 'remove_border')
+
+
+def stored_size(file_):
+    """Размер картинки из базы или ``None``, если он неизвестен."""
+    size = getattr(file_, 'stored_size', None)
+    instance = getattr(file_, 'instance', None)
+    if size is None and instance is not None and file_._committed:
+        size = (
+            getattr(instance, 'image_width', None),
+            getattr(instance, 'image_height', None),
+        )
+    if size is None or None in size:
+        return None
+    return size
+
+
+def thumbnail_size(size, geometry_string, options):
+    """Размер миниатюры картинки ``size`` — как у ``EngineBase``."""
+    width, height = size
+    geometry = parse_geometry(geometry_string, width / height)
+    factors = (geometry[0] / width, geometry[1] / height)
+    factor = max(factors) if options['crop'] else min(factors)
+    if factor < 1 or options['upscale']:
+        width, height = toint(width * factor), toint(height * factor)
+    if options['crop']:
+        width, height = min(width, geometry[0]), min(height, geometry[1])
+    return width, height
+
+
+class StoredSizeBackend(ThumbnailBackend):
+
+    def _full_options(self, source, options):
+        # Те же умолчания, что добавляет ThumbnailBackend.get_thumbnail:
+        # от них зависит имя миниатюры.
+        options = dict(options)
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        size = stored_size(file_)
+        if not file_ or size is None or options.get('crop') == 'smart' or any(
+            options.get(name) for name in UNPREDICTABLE
+        ):
+            return super().get_thumbnail(file_, geometry_string, **options)
+        source = ImageFile(file_)
+        source.set_size(size)
+        full = self._full_options(source, options)
+        thumbnail = ImageFile(
+            self._get_thumbnail_filename(source, geometry_string, full),
+            default.storage,
+        )
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        if settings.THUMBNAIL_FORCE_OVERWRITE or not thumbnail.exists():
+            return super().get_thumbnail(file_, geometry_string, **options)
+        thumbnail.set_size(thumbnail_size(size, geometry_string, full))
+        default.kvstore.get_or_set(source)
+        default.kvstore.set(thumbnail, source)
+        return thumbnail
@@ -1,18 +1,219 @@
-from django.contrib import admin
+from itertools import chain
 
-from .models import Comment, Follow, Group, Post
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME, ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.template.response import TemplateResponse
 
+from core.paginator import EstimatedCountPaginator
 
-class PostAdmin(admin.ModelAdmin):
+from . import moderation
+from .models import ArchivedPost, Comment, Follow, Group, Post
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Autocomplete, которому подписи выбранных объектов передаются заранее.
+
+    Обычный виджет ищет выбранный объект отдельным запросом, и в
+    ``list_editable`` это запрос на каждую строку списка.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Общий для копий виджета во всех формах одного списка.
+        self.labels = {}
+
+    def optgroups(self, name, value, attr=None):
+        selected = [
+            str(item) for item in value
+            if str(item) not in self.choices.field.empty_values
+        ]
+        if any(item not in self.labels for item in selected):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for item in selected:
+            options.append(self.create_option(
+                name, item, self.labels[item], True, len(options)
+            ))
+        return [(None, options, 0)]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Без полного COUNT(*) на каждой странице списка.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_formset(self, request, **kwargs):
+        formset = super().get_changelist_formset(request, **kwargs)
+        names = [
+            name for name in self.get_autocomplete_fields(request)
+            if name in self.list_editable
+        ]
+
+        class ChangelistFormSet(formset):
+            def _construct_form(self, i, **kwargs):
+                # Связанные объекты строки уже загружены
+                # list_select_related — подписи берутся из них.
+                form = super()._construct_form(i, **kwargs)
+                for name in names:
+                    related = getattr(form.instance, name)
+                    if related is None:
+                        continue
+                    field = form.fields[name]
+                    widget = getattr(field.widget, 'widget', field.widget)
+                    widget.labels[str(related.pk)] = (
+                        field.label_from_instance(related)
+                    )
+                return form
+
+        return ChangelistFormSet
+
+    def run_in_chunks(self, request, chunks, message):
+        total = batches = 0
+        for count in chunks:
+            total += count
+            batches += 1
+        self.message_user(
+            request,
+            f'{message}: {total} (пачек по {moderation.CHUNK_SIZE}: '
+            f'{batches})',
+            messages.SUCCESS,
+        )
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа',
+        widget=AutocompleteSelect(
+            Post._meta.get_field('group').remote_field, admin.site,
+        ),
+    )
+    no_group = forms.BooleanField(required=False, label='Без группы')
+
+    def is_valid_move(self):
+        """Форма верна и группа для переноса выбрана явно.
+
+        Пустая группа — только отметкой «Без группы», а не по ошибке в
+        форме. Общая проверка формы действий этого не требует: форма та
+        же и у других действий.
+        """
+        if not self.is_valid():
+            return False
+        if (self.cleaned_data['group'] is None) != (
+            self.cleaned_data['no_group']
+        ):
+            self.add_error(
+                None, 'Выберите группу или отметьте «Без группы».',
+            )
+            return False
+        return True
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date', 'group')
+    date_hierarchy = 'pub_date'
+    actions = ('move_to_group', 'delete_author_posts')
+    action_form = PostActionForm
 
     empty_value_display = '-пусто-'
 
+    def move_to_group(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid_move():
+            return TemplateResponse(
+                request, 'admin/posts/post/move_to_group.html',
+                {
+                    **self.admin_site.each_context(request),
+                    'title': 'Перенос постов в группу',
+                    'opts': self.model._meta,
+                    'form': form,
+                    'count': queryset.count(),
+                    'selected': request.POST.getlist(
+                        ACTION_CHECKBOX_NAME
+                    ),
+                    'action_checkbox_name': ACTION_CHECKBOX_NAME,
+                    'media': self.media + form.media,
+                },
+            )
+        group = form.cleaned_data['group']
+        self.run_in_chunks(
+            request, moderation.move_to_group(queryset, group),
+            f'Перенесено в «{group or "без группы"}» постов',
+        )
+    move_to_group.short_description = 'Перенести в выбранную группу'
+
+    def delete_author_posts(self, request, queryset):
+        authors = set(queryset.values_list('author_id', flat=True))
+        self.run_in_chunks(
+            request,
+            chain(
+                moderation.delete_posts(
+                    Post.objects.filter(author_id__in=authors)
+                ),
+                moderation.delete_posts(
+                    ArchivedPost.objects.filter(author_id__in=authors)
+                ),
+            ),
+            f'Удалено постов авторов ({len(authors)})',
+        )
+    delete_author_posts.short_description = (
+        'Удалить все посты авторов выбранных постов (спам)'
+    )
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    search_fields = ('text',)
+    date_hierarchy = 'created'
+    actions = ('delete_author_comments',)
+
+    def delete_author_comments(self, request, queryset):
+        authors = set(queryset.values_list('author_id', flat=True))
+        self.run_in_chunks(
+            request,
+            moderation.delete_comments(
+                Comment.objects.filter(author_id__in=authors)
+            ),
+            f'Удалено комментариев авторов ({len(authors)})',
+        )
+    delete_author_comments.short_description = (
+        'Удалить все комментарии авторов выбранных комментариев'
+    )
+
+
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Follow)
-admin.site.register(Comment)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Follow, FollowAdmin)
+admin.site.register(Comment, CommentAdmin)
@@ -0,0 +1,132 @@
+"""Архив старых постов.
+
+Посты старше ``ARCHIVE_AFTER_DAYS`` вместе с комментариями переносятся
+командой ``archive_posts`` в таблицы ``ArchivedPost`` и
+``ArchivedComment``, так что горячая таблица ``Post`` и её индексы
+остаются маленькими. Картинки при этом копируются в ``archive_storage``,
+если архив отдельный (задан ``ARCHIVE_FILE_STORAGE`` или
+``ARCHIVE_MEDIA_ROOT``).
+
+Ленты профиля и группы — это ``TieredPosts``: сначала горячие посты,
+за ними архивные. Архив читается, только когда страница до него
+доходит, а его размер для групп берётся из кэша (при ``CACHED_LOOKUPS``).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import router, transaction
+from django.utils import timezone
+
+from core.storage import archive_storage, release
+
+from .cache import (CACHE_TIMEOUT, GROUP_ARCHIVE_KEY,
+                    invalidate_group_archive, invalidate_group_posts)
+from .lookups import post_by_id
+from .moderation import chunked_pks
+from .models import (IMAGE_FIELDS, ArchivedComment, ArchivedPost, Comment,
+                     Post)
+
+CHUNK_SIZE = 500
+
+
+class TieredPosts:
+    """Горячая выборка, а за ней архивная — как одна лента для Paginator."""
+
+    def __init__(self, hot, hot_count, archived, archived_count):
+        self.hot = hot
+        self.hot_count = hot_count
+        self.archived = archived
+        self.archived_count = archived_count
+
+    def count(self):
+        return self.hot_count + self.archived_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        split = self.hot_count
+        if not isinstance(key, slice):
+            if key < split:
+                return self.hot[key]
+            return self.archived[key - split]
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        if stop <= split:
+            return self.hot[start:stop]
+        if start >= split:
+            return self.archived[start - split:stop - split]
+        return list(self.hot[start:split]) + list(self.archived[:stop - split])
+
+
+def archived_group_count(group):
+    if not settings.CACHED_LOOKUPS:
+        return group.archived_posts.count()
+    key = GROUP_ARCHIVE_KEY.format(group_id=group.pk)
+    count = cache.get(key)
+    if count is None:
+        count = group.archived_posts.count()
+        cache.set(key, count, CACHE_TIMEOUT)
+    return count
+
+
+def _copy_image(name, copied):
+    if not name or not archive_storage.separate:
+        return name
+    try:
+        with default_storage.open(name) as image:
+            stored = archive_storage.save(name, image)
+    except FileNotFoundError:
+        return name
+    copied.append((name, stored))
+    return stored
+
+
+def archive(before=None, days=None, size=CHUNK_SIZE):
+    """Переносит в архив посты, опубликованные раньше ``before``.
+
+    Генератор: после каждой пачки отдаёт число перенесённых постов.
+    """
+    if before is None:
+        before = timezone.now() - timedelta(days=days)
+    using = router.db_for_write(Post)
+    queryset = Post.objects.filter(pub_date__lt=before)
+    for pks in chunked_pks(queryset, size):
+        copied = []
+        try:
+            with transaction.atomic(using=using):
+                posts = list(Post.objects.filter(pk__in=pks).values(
+                    'id', 'text', 'text_html', 'excerpt_html', 'title',
+                    'pub_date', 'author_id', 'group_id', 'image',
+                    *IMAGE_FIELDS,
+                ))
+                ArchivedPost.objects.bulk_create([
+                    ArchivedPost(**dict(
+                        post, image=_copy_image(post['image'], copied)
+                    ))
+                    for post in posts
+                ])
+                ArchivedComment.objects.bulk_create([
+                    ArchivedComment(**comment)
+                    for comment in Comment.objects.filter(post_id__in=pks)
+                    .values('id', 'post_id', 'author_id', 'text', 'created')
+                    .iterator()
+                ])
+                Comment.objects.filter(post_id__in=pks)._raw_delete(using)
+                Post.objects.filter(pk__in=pks)._raw_delete(using)
+        except BaseException:
+            # Строки архива откатились, а записанные копии картинок — нет.
+            for _, stored in copied:
+                archive_storage.delete(stored)
+            raise
+        # Ссылки на оригиналы отпускаются только после коммита: при откате
+        # пачки горячие посты должны остаться со своими картинками.
+        for name, _ in copied:
+            release(default_storage, name)
+        groups = {post['group_id'] for post in posts}
+        invalidate_group_posts(*groups)
+        post_by_id.invalidate_many(pks)
+        invalidate_group_archive(*groups)
+        yield len(posts)
@@ -0,0 +1,73 @@
+"""Кэш лент групп.
+
+Для ленты группы кэшируется общее число постов и id постов первых
+``CACHED_PAGES`` страниц. Горячая страница группы обходится одним
+запросом — выборкой постов страницы по id; сама группа берётся из
+``group_by_slug`` (см. ``posts/lookups.py``).
+
+Кэш сбрасывается сигналами сохранения и удаления ``Post`` и ``Group``
+(см. ``posts/signals.py``). ``bulk_create`` и ``QuerySet.update`` сигналов
+не посылают — после них нужно вызвать ``invalidate_group_posts`` вручную.
+
+Как и ``CachedLookup``, кэш включается настройкой ``CACHED_LOOKUPS``: сброс
+из команд не дойдёт до локального кэша веб-воркеров.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+CACHED_PAGES = 5
+CACHE_TIMEOUT = 60 * 60
+GROUP_POSTS_KEY = 'group:{group_id}:posts'
+GROUP_ARCHIVE_KEY = 'group:{group_id}:archived'
+
+
+def invalidate_group_posts(*group_ids):
+    cache.delete_many([
+        GROUP_POSTS_KEY.format(group_id=group_id)
+        for group_id in group_ids if group_id is not None
+    ])
+
+
+def invalidate_group_archive(*group_ids):
+    """Сбрасывает закэшированное число архивных постов групп."""
+    cache.delete_many([
+        GROUP_ARCHIVE_KEY.format(group_id=group_id)
+        for group_id in group_ids if group_id is not None
+    ])
+
+
+class GroupPostWindow:
+    """Лента группы для ``Paginator`` с закэшированным окном первых страниц.
+
+    Срезы внутри окна превращаются в выборку по закэшированным id,
+    более глубокие страницы читаются обычным запросом со смещением.
+    """
+
+    def __init__(self, group, per_page):
+        self.queryset = group.posts.as_feed()
+        key = GROUP_POSTS_KEY.format(group_id=group.pk)
+        window = cache.get(key) if settings.CACHED_LOOKUPS else None
+        if window is None:
+            window = (
+                self.queryset.count(),
+                list(self.queryset.values_list('id', flat=True)[
+                    :CACHED_PAGES * per_page
+                ]),
+            )
+            if settings.CACHED_LOOKUPS:
+                cache.set(key, window, CACHE_TIMEOUT)
+        self.total, self.ids = window
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self.queryset[key]
+        stop = self.total if key.stop is None else key.stop
+        if stop <= len(self.ids) or len(self.ids) == self.total:
+            return self.queryset.filter(id__in=self.ids[key])
+        return self.queryset[key]
@@ -0,0 +1,175 @@
+"""Сборка мусора в медиафайлах постов.
+
+Каталоги картинок постов, архива и миниатюр sorl обходятся через
+``os.scandir``. Имена файлов, на которые ссылаются посты, архивные посты
+и kvstore sorl, потоком читаются из базы в фильтр Блума: файла, которого
+в фильтре нет, точно никто не использует. Ложные срабатывания фильтра
+(``ERROR_RATE``) только оставляют часть мусора до следующего запуска.
+
+Файлы моложе ``min_age`` не трогаются — их могли загрузить во время
+обхода, — а картинки постов перед удалением ещё раз пачкой проверяются
+точным запросом. Найденный мусор удаляется или переносится в каталог
+карантина. Вместе с картинкой уходят её строка ``StoredFile``, записи sorl
+и файлы её миниатюр; в отчёт они не входят.
+"""
+import json
+import os
+import shutil
+import time
+from itertools import chain
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from sorl.thumbnail import default as thumbnails
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.models import KVStore
+
+from core.bloom import BloomFilter
+from core.models import StoredFile
+from core.storage import archive_storage
+
+from .models import ArchivedPost, Post
+from .transfer import batches
+
+BATCH_SIZE = 500
+ERROR_RATE = 0.001
+MIN_AGE = 24 * 60 * 60
+
+
+def _walk(root, directory):
+    """``(имя от root, stat)`` всех файлов каталога и его подкаталогов."""
+    stack = [os.path.join(root, directory)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    name = os.path.relpath(entry.path, root)
+                    yield name.replace(os.sep, '/'), entry.stat()
+
+
+def _thumbnail_names():
+    # В kvstore лежат и исходные картинки: они не должны попасть в
+    # фильтр, иначе картинка удалённого поста будет считаться нужной.
+    prefix = f'{thumbnail_settings.THUMBNAIL_KEY_PREFIX}||image||'
+    for value in (
+        KVStore.objects.filter(key__startswith=prefix)
+        .values_list('value', flat=True).iterator()
+    ):
+        name = json.loads(value)['name']
+        if name.startswith(thumbnail_settings.THUMBNAIL_PREFIX):
+            yield name
+
+
+def _image_names(model):
+    return (
+        model.objects.exclude(image='')
+        .values_list('image', flat=True).iterator()
+    )
+
+
+def references():
+    """Фильтр Блума по именам всех используемых файлов."""
+    capacity = (
+        Post.objects.exclude(image='').count()
+        + ArchivedPost.objects.exclude(image='').count()
+        + KVStore.objects.count()
+    )
+    bloom = BloomFilter(capacity, ERROR_RATE)
+    bloom.update(chain(
+        _image_names(Post), _image_names(ArchivedPost), _thumbnail_names(),
+    ))
+    return bloom
+
+
+def areas():
+    """``(корень, каталог, хранилище)`` для обхода.
+
+    Хранилище ``None`` у каталога миниатюр: на них не ссылаются посты.
+    """
+    upload_to = Post._meta.get_field('image').upload_to.rstrip('/')
+    yield settings.MEDIA_ROOT, upload_to, default_storage
+    yield (
+        settings.MEDIA_ROOT,
+        thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/'), None,
+    )
+    # Обходится только архив на диске; прочие хранилища чистят сами.
+    backend = archive_storage.backend
+    if archive_storage.separate and isinstance(backend, FileSystemStorage):
+        yield backend.location, upload_to, archive_storage
+
+
+def _still_used(names):
+    return set(chain.from_iterable(
+        model.objects.filter(image__in=names)
+        .values_list('image', flat=True)
+        for model in (Post, ArchivedPost)
+    ))
+
+
+def _dispose(root, name, quarantine):
+    path = os.path.join(root, name)
+    if quarantine is None:
+        os.remove(path)
+        return
+    # Корень — в пути карантина: у архива и медиа одинаковые имена.
+    target = os.path.join(quarantine, os.path.basename(root), name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.move(path, target)
+
+
+def _forget(names, storage):
+    """Убирает учёт ссылок и миниатюры sorl удалённых картинок."""
+    StoredFile.objects.filter(name__in=names).delete()
+    for name in names:
+        thumbnails.kvstore.delete(ImageFile(name, storage))
+
+
+def _candidates(root, directory, used, before, quarantine):
+    skip = os.path.realpath(quarantine) + os.sep if quarantine else None
+    for name, stat in _walk(root, directory):
+        if stat.st_mtime >= before or name in used:
+            continue
+        path = os.path.realpath(os.path.join(root, name))
+        if skip is not None and path.startswith(skip):
+            continue
+        yield name, stat
+
+
+def collect(min_age=MIN_AGE, quarantine=None, dry_run=False,
+            batch_size=BATCH_SIZE):
+    """Генератор пачек ``[(имя, байты)]`` удалённых файлов.
+
+    При ``dry_run`` ничего не меняется, отдаются найденные файлы.
+    """
+    if not dry_run:
+        # Записи о миниатюрах картинок, удалённых из хранилища
+        # (``release``), sorl убирает вместе с файлами миниатюр.
+        thumbnails.kvstore.cleanup()
+    used = references()
+    before = time.time() - min_age
+    for root, directory, storage in areas():
+        for batch in batches(
+            _candidates(root, directory, used, before, quarantine),
+            batch_size,
+        ):
+            if storage is not None:
+                used_now = _still_used([name for name, _ in batch])
+                batch = [
+                    (name, stat) for name, stat in batch
+                    if name not in used_now
+                ]
+            if not batch:
+                continue
+            if not dry_run:
+                for name, _ in batch:
+                    _dispose(root, name, quarantine)
+                if storage is not None:
+                    _forget([name for name, _ in batch], storage)
+            yield [(name, stat.st_size) for name, stat in batch]
@@ -0,0 +1,96 @@
+"""Буферизованная запись комментариев.
+
+Комментарии, пришедшие в разных потоках в пределах
+``COMMENT_BUFFER_DELAY`` секунд, вставляются одним ``bulk_create``.
+Первый запрос пачки ждёт эту задержку (или пока пачка не наберёт
+``COMMENT_BUFFER_SIZE``) и записывает её; остальные ждут записи, так
+что к ответу комментарий уже в базе.
+
+Если пачка не записалась целиком (например, один из постов успели
+удалить), строки пишутся по одной, и ошибку получает только запрос с
+плохой строкой.
+
+``bulk_create`` не посылает ``post_save``, поэтому счётчики популярности
+обновляются здесь же.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from . import trending
+from .models import Comment
+
+
+class _Batch:
+    __slots__ = ('comments', 'full', 'done', 'error', 'errors')
+
+    def __init__(self):
+        self.comments = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+        self.errors = {}
+
+    def raise_error(self, index):
+        if self.error is not None:
+            raise self.error
+        if index in self.errors:
+            raise self.errors[index]
+
+
+class CommentBuffer:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._batch = None
+
+    def save(self, comment):
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            index = len(batch.comments)
+            batch.comments.append(comment)
+            if len(batch.comments) >= settings.COMMENT_BUFFER_SIZE:
+                batch.full.set()
+        if not leader:
+            batch.done.wait()
+            batch.raise_error(index)
+            return
+        batch.full.wait(settings.COMMENT_BUFFER_DELAY)
+        with self._lock:
+            self._batch = None
+        try:
+            batch.errors = self.flush(batch.comments) or {}
+        except Exception as error:
+            batch.error = error
+            raise
+        finally:
+            batch.done.set()
+        batch.raise_error(index)
+
+    def flush(self, comments):
+        """Записывает пачку; ``{номер в пачке: ошибка}`` для несохранённых."""
+        errors = {}
+        try:
+            with transaction.atomic():
+                Comment.objects.bulk_create(comments)
+            saved = comments
+        except DatabaseError:
+            saved = []
+            for index, comment in enumerate(comments):
+                try:
+                    with transaction.atomic():
+                        Comment.objects.bulk_create([comment])
+                except DatabaseError as error:
+                    errors[index] = error
+                else:
+                    saved.append(comment)
+        for comment in saved:
+            trending.record_comment(comment)
+        return errors
+
+
+buffer = CommentBuffer()
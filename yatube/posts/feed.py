@@ -0,0 +1,180 @@
+"""Лёгкие строки для лент.
+
+Карточке поста в ленте нужны id, дата, HTML отрывка, картинка с
+заглушкой, имя автора и slug группы. ``PostQuerySet.as_feed`` выбирает
+ровно эти колонки через ``values_list``, а ``FeedIterable`` собирает из
+кортежей строки со ``__slots__`` — без ``Model.__init__``, сигналов и
+``_state``. Автор и группа, повторяющиеся на странице, создаются один
+раз.
+
+Строки только для чтения. Атрибут, которого нет в выборке (``text``,
+``comments`` и т. п.), загружает модель целиком при первом обращении —
+как отложенное поле. Это запрос на каждую строку ленты, поэтому такие
+загрузки считаются в метрике ``yatube_feed_row_loads_total`` и пишутся в
+журнал медленных запросов с местом вызова: нужное поле стоит добавить в
+колонки. Строка равна экземпляру модели с тем же pk.
+
+У строк, сохранённых в обход ``save`` и ещё не заполненных командой
+backfill_posts, HTML отрывка нет: база отдаёт начало текста, и оно
+экранируется здесь.
+"""
+import sys
+
+from django.db.models.query import ValuesListIterable
+from django.template.defaultfilters import linebreaksbr
+from django.utils.safestring import mark_safe
+
+from core.metrics import FEED_ROW_LOADS
+from core.profiling import call_site, logger
+
+AUTHOR_COLUMNS = (
+    'author_id', 'author__username', 'author__first_name',
+    'author__last_name',
+)
+GROUP_COLUMNS = ('group_id', 'group__title', 'group__slug')
+POST_COLUMNS = (
+    'id', 'pub_date', 'excerpt_html', 'text_start', 'image', 'image_width',
+    'image_height', 'image_placeholder',
+)
+FEED_COLUMNS = POST_COLUMNS + AUTHOR_COLUMNS + GROUP_COLUMNS
+
+
+class Row:
+    __slots__ = ('id', '_model', '_instance')
+    fields = ()
+
+    def __init__(self, model, *values):
+        self._model = model
+        self._instance = None
+        for name, value in zip(self.fields, values):
+            setattr(self, name, value)
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __getattr__(self, name):
+        # Сюда попадают только атрибуты, которых нет в слотах.
+        if name.startswith('_') or not hasattr(self._model, name):
+            raise AttributeError(name)
+        if self._instance is None:
+            label = self._model._meta.label
+            FEED_ROW_LOADS.inc(model=label, attribute=name)
+            site, template = call_site(sys._getframe(1))
+            logger.warning('feed row load', extra={'event': {
+                'type': 'feed_row_load',
+                'model': label,
+                'attribute': name,
+                'site': site,
+                'template': template,
+            }})
+            self._instance = self._model._default_manager.get(pk=self.id)
+        return getattr(self._instance, name)
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            return self._model is other._model and self.id == other.id
+        meta = getattr(other, '_meta', None)
+        if meta is None:
+            return NotImplemented
+        return meta.concrete_model is self._model and other.pk == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self._model.__name__}: {self.id}>'
+
+
+class AuthorRow(Row):
+    __slots__ = ('username', 'first_name', 'last_name')
+    fields = ('id',) + __slots__
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def __str__(self):
+        return self.username
+
+
+class GroupRow(Row):
+    __slots__ = ('title', 'slug')
+    fields = ('id',) + __slots__
+
+    def __str__(self):
+        return self.title
+
+
+class PostRow(Row):
+    __slots__ = ('pub_date', 'summary', 'image', 'image_placeholder',
+                 'author', 'group')
+    fields = ('id',) + __slots__
+
+
+class ImageRef:
+    """Имя картинки, хранилище и размеры — всё, что нужно тегу ``thumbnail``.
+
+    ``stored_size`` позволяет бэкенду миниатюр не открывать файл (см.
+    core/thumbnails.py).
+    """
+
+    __slots__ = ('name', 'storage', 'width', 'height')
+
+    def __init__(self, name, storage, width=None, height=None):
+        self.name = name
+        self.storage = storage
+        self.width = width
+        self.height = height
+
+    @property
+    def stored_size(self):
+        if self.width is None or self.height is None:
+            return None
+        return self.width, self.height
+
+    @property
+    def url(self):
+        return self.storage.url(self.name)
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __str__(self):
+        return self.name or ''
+
+
+class FeedIterable(ValuesListIterable):
+    """Кортежи ``FEED_COLUMNS`` как ``PostRow``."""
+
+    def __iter__(self):
+        model = self.queryset.model
+        author_model = model._meta.get_field('author').related_model
+        group_model = model._meta.get_field('group').related_model
+        storage = model._meta.get_field('image').storage
+        authors, groups = {}, {}
+        posts = len(POST_COLUMNS)
+        groups_at = posts + len(AUTHOR_COLUMNS)
+        for values in super().__iter__():
+            author_id = values[posts]
+            author = authors.get(author_id)
+            if author is None:
+                author = authors[author_id] = AuthorRow(
+                    author_model, *values[posts:groups_at]
+                )
+            group_id = values[groups_at]
+            group = groups.get(group_id)
+            if group is None and group_id is not None:
+                group = groups[group_id] = GroupRow(
+                    group_model, *values[groups_at:]
+                )
+            (post_id, pub_date, excerpt_html, text_start, image, width,
+             height, image_placeholder) = values[:posts]
+            if excerpt_html:
+                summary = mark_safe(excerpt_html)
+            else:
+                summary = linebreaksbr(text_start, autoescape=True)
+            yield PostRow(
+                model, post_id, pub_date, summary,
+                ImageRef(image, storage, width, height), image_placeholder,
+                author, group,
+            )
@@ -1,9 +1,27 @@
+import hashlib
+
 from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+
+from core.ratelimit import consume
 
+from . import images
 from .models import Comment, Post
 
+COMMENT_HASH_KEY = 'comment:{post_id}:{digest}'
+
 
 class PostForm(forms.ModelForm):
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return images.ingest(image)
+        return image
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
@@ -18,6 +36,53 @@ class PostForm(forms.ModelForm):
 
 
 class CommentForm(forms.ModelForm):
+    """Форма комментария с защитой от флуда.
+
+    Если переданы автор и пост, ``clean`` расходует жетон из корзины
+    автора (``COMMENT_RATE_LIMIT``) и отклоняет текст, который уже
+    оставляли под этим постом за последние ``COMMENT_DEDUP_WINDOW``
+    секунд.
+    """
+
+    error_messages = {
+        'rate_limited': 'Слишком много комментариев. Попробуйте позже.',
+        'duplicate': 'Такой комментарий уже оставлен.',
+    }
+    rate_limited = False
+    dedup_key = None
+
+    def __init__(self, *args, author=None, post=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.author = author
+        self.post = post
+
+    def clean(self):
+        cleaned_data = super().clean()
+        text = cleaned_data.get('text')
+        if self.author is None or self.post is None or not text:
+            return cleaned_data
+        if not consume('comment', self.author.pk,
+                       *settings.COMMENT_RATE_LIMIT):
+            self.rate_limited = True
+            raise ValidationError(
+                self.error_messages['rate_limited'], code='rate_limited',
+            )
+        digest = hashlib.sha1(
+            ' '.join(text.split()).casefold().encode()
+        ).hexdigest()
+        key = COMMENT_HASH_KEY.format(post_id=self.post.pk, digest=digest)
+        if not cache.add(key, True, settings.COMMENT_DEDUP_WINDOW):
+            raise ValidationError(
+                self.error_messages['duplicate'], code='duplicate',
+            )
+        self.dedup_key = key
+        return cleaned_data
+
+    def forget(self):
+        """Снимает отметку о тексте, если комментарий не записался."""
+        if self.dedup_key is not None:
+            cache.delete(self.dedup_key)
+
     class Meta:
         model = Comment
         fields = ('text',)
@@ -0,0 +1,152 @@
+"""Обработка картинок постов при загрузке.
+
+Картинка проверяется по заголовку до декодирования (``IMAGE_MAX_PIXELS``
+защищает от «бомб»), уменьшается до ``IMAGE_MAX_SIDE`` по большей
+стороне, поворачивается по EXIF и перекодируется без метаданных:
+непрозрачные — в JPEG с ``IMAGE_JPEG_QUALITY``, с прозрачностью — в PNG.
+Анимированные картинки сохраняются как есть.
+
+Результат пишется во временный файл, который уходит на диск после
+``IMAGE_SPOOL_SIZE`` байт. Одинаковые картинки хранилище сводит в один
+файл по хешу содержимого (см. core/storage.py).
+
+``describe`` читает только заголовок картинки: размеры, формат и размер
+файла сохраняются в ``Post``, чтобы не открывать файл при выводе. Там же
+хранится ``placeholder`` — копия в ``PLACEHOLDER_SIDE`` пикселей, которую
+лента показывает встроенной, пока грузится сама картинка.
+"""
+import os
+import shutil
+import warnings
+from base64 import b64encode
+from contextlib import contextmanager
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+CHUNK_SIZE = 64 * 1024
+# Метаданные, которые не переносятся в сохранённую картинку.
+STRIPPED_INFO = ('exif', 'XML:com.adobe.xmp', 'comment')
+PLACEHOLDER_SIDE = 16
+PLACEHOLDER_QUALITY = 50
+# Ошибки чтения сохранённой картинки: файла нет, он битый или вне MEDIA_ROOT.
+UNREADABLE = (
+    OSError, ValueError, SuspiciousFileOperation, Image.DecompressionBombError,
+)
+
+
+def _open(upload):
+    upload.seek(0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+        try:
+            image = Image.open(upload)
+        except (Image.DecompressionBombWarning,
+                Image.DecompressionBombError):
+            image = None
+    if image is None or (
+        image.size[0] * image.size[1] > settings.IMAGE_MAX_PIXELS
+    ):
+        raise ValidationError(
+            'Слишком большое разрешение картинки.', code='too_large',
+        )
+    return image
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def _encode(image, output):
+    side = settings.IMAGE_MAX_SIDE
+    alpha = _has_alpha(image)
+    if image.format == 'JPEG':
+        # Декодер JPEG сразу уменьшает картинку в 2–8 раз, не распаковывая
+        # оригинал целиком.
+        image.draft('RGB', (side, side))
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA' if alpha else 'RGB')
+    image.thumbnail((side, side), Image.LANCZOS, reducing_gap=3.0)
+    image = ImageOps.exif_transpose(image)
+    for key in STRIPPED_INFO:
+        image.info.pop(key, None)
+    if alpha:
+        image.save(output, 'PNG', optimize=True)
+        return '.png'
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(
+        output, 'JPEG', quality=settings.IMAGE_JPEG_QUALITY,
+        optimize=True, progressive=True,
+    )
+    return '.jpg'
+
+
+def ingest(upload):
+    """Обработанная картинка для ``Post.image`` — ``File`` для сохранения."""
+    image = _open(upload)
+    output = SpooledTemporaryFile(max_size=settings.IMAGE_SPOOL_SIZE)
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        shutil.copyfileobj(upload, output, CHUNK_SIZE)
+        extension = os.path.splitext(upload.name)[1].lower()
+    else:
+        extension = _encode(image, output)
+    image.close()
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return File(output, name=name + extension)
+
+
+@contextmanager
+def _reading(file):
+    closed = file.closed
+    file.open('rb')
+    try:
+        file.seek(0)
+        yield file
+        file.seek(0)
+    finally:
+        if closed:
+            file.close()
+
+
+def describe(file):
+    """``(ширина, высота, формат, байты)`` картинки или ``None``.
+
+    Декодируется только заголовок. Недоступный или битый файл даёт
+    ``None``, а не исключение.
+    """
+    try:
+        with _reading(file), Image.open(file) as image:
+            width, height = image.size
+            image_format = image.format
+        return width, height, image_format, file.size
+    except UNREADABLE:
+        return None
+
+
+def placeholder(file):
+    """Крошечная JPEG-копия картинки как data URI; ``''``, если не вышло."""
+    side = PLACEHOLDER_SIDE
+    try:
+        with _reading(file), Image.open(file) as image:
+            image.draft('RGB', (side, side))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((side, side))
+            if _has_alpha(image):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            buffer = BytesIO()
+            image.convert('RGB').save(
+                buffer, 'JPEG', quality=PLACEHOLDER_QUALITY,
+            )
+    except UNREADABLE:
+        return ''
+    return 'data:image/jpeg;base64,' + b64encode(buffer.getvalue()).decode()
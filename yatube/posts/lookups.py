@@ -0,0 +1,12 @@
+"""Закэшированные выборки групп, постов и авторов (см. core/lookup.py)."""
+from django.contrib.auth import get_user_model
+
+from core.lookup import CachedLookup
+
+from .models import Group, Post
+
+User = get_user_model()
+
+group_by_slug = CachedLookup(Group, 'slug')
+post_by_id = CachedLookup(Post, 'id')
+user_by_username = CachedLookup(User, User.USERNAME_FIELD)
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.archive import CHUNK_SIZE, archive
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые посты и комментарии к ним в архивные таблицы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help='Архивировать посты старше этого числа дней.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько постов переносить в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = 0
+        for count in archive(days=options['days'],
+                             size=options['chunk_size']):
+            total += count
+            self.stdout.write(f'Перенесено постов: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'В архиве новых постов: {total} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.lookups import post_by_id
+from posts.models import IMAGE_FIELDS, Post
+from posts.moderation import CHUNK_SIZE, chunked_pks
+
+
+class Command(BaseCommand):
+    help = ('Заполняет сведения о картинках, HTML текста и отрывки у '
+            'постов, сохранённых без них.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать все посты, а не только незаполненные.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько постов обновлять одним запросом.',
+        )
+
+    def backfill_images(self, chunk_size, everything):
+        queryset = Post.objects.exclude(image='')
+        if not everything:
+            queryset = queryset.filter(
+                Q(image_width__isnull=True) | Q(image_placeholder='')
+            )
+        filled = missing = 0
+        for pks in chunked_pks(queryset, chunk_size):
+            posts = list(Post.objects.filter(pk__in=pks).only('image'))
+            for post in posts:
+                if post.fill_image_fields():
+                    filled += 1
+                else:
+                    missing += 1
+            Post.objects.bulk_update(posts, IMAGE_FIELDS)
+            post_by_id.invalidate_many(pks)
+            self.stdout.write(f'Обработано картинок: {filled + missing}')
+        return filled, missing
+
+    def backfill_text(self, chunk_size, everything):
+        queryset = Post.objects.all()
+        if not everything:
+            queryset = queryset.filter(excerpt_html='')
+        rendered = 0
+        for pks in chunked_pks(queryset, chunk_size):
+            posts = list(Post.objects.filter(pk__in=pks).only('text'))
+            for post in posts:
+                post.render_text()
+            Post.objects.bulk_update(
+                posts, ('text_html', 'excerpt_html', 'title'),
+            )
+            post_by_id.invalidate_many(pks)
+            rendered += len(posts)
+            self.stdout.write(f'Обработано текстов: {rendered}')
+        return rendered
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        filled, missing = self.backfill_images(
+            options['chunk_size'], options['all'],
+        )
+        rendered = self.backfill_text(options['chunk_size'], options['all'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено: {filled}, файл недоступен: {missing}, '
+            f'текстов: {rendered} за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,82 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Group, Post
+from posts.views import POSTS_ON_PAGE
+
+User = get_user_model()
+
+
+def touch(posts):
+    """Читает у постов страницы то же, что карточка в шаблоне."""
+    for post in posts:
+        (post.id, post.pub_date, post.summary, post.image.name,
+         post.image_placeholder, post.author.username,
+         post.author.get_full_name(),
+         post.group is not None and post.group.slug)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время и память на страницу ленты у экземпляров '
+            'моделей и у лёгких строк as_feed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=50,
+            help='Сколько страниц читать в каждом замере.',
+        )
+        parser.add_argument(
+            '--per-page', type=int, default=POSTS_ON_PAGE,
+            help='Постов на странице.',
+        )
+
+    def measure(self, queryset, pages, per_page):
+        tracemalloc.start()
+        started = time.process_time()
+        for page in range(pages):
+            touch(queryset[page * per_page:(page + 1) * per_page])
+        spent = time.process_time() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return spent / pages, peak
+
+    def handle(self, *args, **options):
+        pages, per_page = options['pages'], options['per_page']
+        with transaction.atomic():
+            # Недостающие посты создаются и откатываются после замера.
+            missing = pages * per_page - Post.objects.count()
+            if missing > 0:
+                author = User.objects.create_user(
+                    username='bench-feed-user', first_name='Bench',
+                )
+                group = Group.objects.create(
+                    title='Bench', slug='bench-feed-group',
+                )
+                Post.objects.bulk_create(
+                    Post(author=author, group=group, text='текст ' * 100)
+                    for _ in range(missing)
+                )
+            results = {
+                'Модели': self.measure(
+                    Post.objects.select_related('author', 'group').feed(),
+                    pages, per_page,
+                ),
+                'as_feed': self.measure(
+                    Post.objects.as_feed(), pages, per_page,
+                ),
+            }
+            transaction.set_rollback(True)
+        for name, (cpu, peak) in results.items():
+            self.stdout.write(
+                f'{name}: {cpu * 1000:.2f} мс CPU на страницу, '
+                f'пик памяти {peak / 1024:.1f} КБ'
+            )
+        (model_cpu, model_peak), (row_cpu, row_peak) = results.values()
+        self.stdout.write(self.style.SUCCESS(
+            f'as_feed: в {model_cpu / row_cpu:.1f} раза быстрее, '
+            f'в {model_peak / row_peak:.1f} раза меньше памяти'
+        ))
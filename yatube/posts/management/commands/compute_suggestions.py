@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import (SUGGESTIONS_PER_USER, compute_scores,
+                                   load_graph, store_scores)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации авторов по графу подписок и групп.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=SUGGESTIONS_PER_USER,
+            help='Сколько рекомендаций хранить для каждого пользователя.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        follows, activity = load_graph()
+        scores = compute_scores(follows, activity)
+        stored = store_scores(scores, limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено рекомендаций: {stored} '
+            f'для {len(scores)} пользователей '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
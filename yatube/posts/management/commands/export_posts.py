@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import CHUNK_SIZE, FORMATS, dump
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии (в том числе архивные) и '
+        'подписки в каталог (NDJSON или CSV) вместе с картинками постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог выгрузки.')
+        parser.add_argument(
+            '--format', choices=FORMATS, default=FORMATS[0],
+            help='Формат файлов таблиц.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк читать из БД за один раз.',
+        )
+        parser.add_argument(
+            '--no-media', action='store_false', dest='media',
+            help='Не копировать картинки постов.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = dump(
+            options['directory'], options['format'],
+            chunk_size=options['chunk_size'], media=options['media'],
+        )
+        elapsed = time.monotonic() - started
+        for table, count in counts.items():
+            self.stdout.write(f'{table}: {count}')
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено строк: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
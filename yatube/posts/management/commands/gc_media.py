@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.cleanup import BATCH_SIZE, MIN_AGE, collect
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки и миниатюры, на которые не ссылается ни '
+            'один пост.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать найденные файлы.',
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Переносить файлы в этот каталог, а не удалять.',
+        )
+        parser.add_argument(
+            '--min-age', type=float, default=MIN_AGE / 3600,
+            help='Не трогать файлы моложе этого числа часов.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько файлов проверять и удалять за раз.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        files = size = 0
+        for batch in collect(
+            min_age=options['min_age'] * 3600,
+            quarantine=options['quarantine'],
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size'],
+        ):
+            files += len(batch)
+            size += sum(file_size for _, file_size in batch)
+            if options['dry_run'] or options['verbosity'] > 1:
+                for name, _ in batch:
+                    self.stdout.write(name)
+        action = 'Найдено' if options['dry_run'] else (
+            'Перенесено в карантин' if options['quarantine'] else 'Удалено'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {files}, {size / 2 ** 20:.1f} МБ '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import CHUNK_SIZE, FORMATS, ConflictError, load
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_posts. Уже существующие строки '
+        'пропускаются, недостающие пользователи создаются без пароля. '
+        'Если id постов или комментариев заняты другими объектами, '
+        'ничего не загружается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог выгрузки.')
+        parser.add_argument(
+            '--format', choices=FORMATS, default=FORMATS[0],
+            help='Формат файлов таблиц.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк вставлять одним bulk_create.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            counts = load(
+                options['directory'], options['format'],
+                batch_size=options['batch_size'],
+            )
+        except ConflictError as error:
+            raise CommandError(error)
+        if not counts:
+            raise CommandError(
+                f'В {options["directory"]} нет файлов '
+                f'формата {options["format"]}'
+            )
+        elapsed = time.monotonic() - started
+        for table, count in counts.items():
+            self.stdout.write(f'{table}: {count}')
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import materialize
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг популярных постов и групп.'
+
+    def handle(self, *args, **options):
+        ranking = materialize()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов в рейтинге: {len(ranking["posts"])}, '
+            f'групп: {len(ranking["groups"])}'
+        ))
@@ -0,0 +1,75 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.rebuild import CHUNK_SIZE, rebuild
+
+REPORT_EVERY = 5
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает миниатюры картинок всех постов на всех ядрах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов; по умолчанию — число ядер, 0 — без пула.',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Строить заново и уже существующие миниатюры.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл, где хранится место остановки; если он есть, '
+                 'пересборка продолжается с него.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько постов читать из базы одним запросом.',
+        )
+
+    def read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as checkpoint:
+            return int(checkpoint.read().strip() or 0)
+
+    def write_checkpoint(self, path, last_pk):
+        # Замена файла атомарна: прерывание не оставит его пустым.
+        with open(path + '.tmp', 'w') as checkpoint:
+            checkpoint.write(str(last_pk))
+        os.replace(path + '.tmp', path)
+
+    def handle(self, *args, **options):
+        path = options['checkpoint']
+        start = self.read_checkpoint(path)
+        if start:
+            self.stdout.write(f'Продолжение после поста {start}')
+        started = reported = time.monotonic()
+        done = failed = 0
+        for last_pk, task_done, task_failed in rebuild(
+            workers=options['workers'], start=start, force=options['force'],
+            chunk_size=options['chunk_size'],
+        ):
+            done += task_done
+            failed += len(task_failed)
+            for name in task_failed:
+                self.stderr.write(f'Не удалось: {name}')
+            if path:
+                self.write_checkpoint(path, last_pk)
+            now = time.monotonic()
+            if now - reported >= REPORT_EVERY:
+                reported = now
+                self.stdout.write(
+                    f'Картинок: {done + failed}, '
+                    f'{(done + failed) / (now - started):.1f} в секунду'
+                )
+        elapsed = time.monotonic() - started
+        if path and os.path.exists(path):
+            os.remove(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done}, ошибок: {failed} за {elapsed:.1f} с '
+            f'({(done + failed) / max(elapsed, 1e-9):.1f} картинок в секунду)'
+        ))
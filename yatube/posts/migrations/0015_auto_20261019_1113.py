@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_auto_20261019_1044'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='archivedpost',
+            name='excerpt',
+        ),
+        migrations.RemoveField(
+            model_name='post',
+            name='excerpt',
+        ),
+        migrations.AddField(
+            model_name='archivedpost',
+            name='excerpt_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML отрывка'),
+        ),
+        migrations.AddField(
+            model_name='archivedpost',
+            name='title',
+            field=models.CharField(blank=True, editable=False, max_length=30, verbose_name='Заголовок'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML отрывка'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='title',
+            field=models.CharField(blank=True, editable=False, max_length=30, verbose_name='Заголовок'),
+        ),
+    ]
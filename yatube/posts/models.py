@@ -1,5 +1,15 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Case, TextField, Value, When
+from django.db.models.functions import Substr
+from django.template.defaultfilters import linebreaksbr
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from core.storage import archive_storage
+
+from .feed import FEED_COLUMNS, FeedIterable
+from .images import describe, placeholder
 
 
 class Group(models.Model):
@@ -14,16 +24,133 @@ class Group(models.Model):
 User = get_user_model()
 
 CHAR = 15
+EXCERPT_LENGTH = 300
+TITLE_LENGTH = 30
+# Поля с полным текстом поста; лентам они не нужны.
+BODY_FIELDS = ('text', 'text_html', 'title')
+# Сведения о картинке, которые хранятся рядом с ней (см. Post.save).
+IMAGE_FIELDS = (
+    'image_width', 'image_height', 'image_format', 'image_size',
+    'image_placeholder',
+)
+
+
+class ImageMetadata(models.Model):
+    """Размеры, формат, размер и заглушка картинки поста.
+
+    Заполняются при сохранении, а не через ``width_field``/``height_field``
+    у ``ImageField``: те читают файл при создании каждого экземпляра, пока
+    поля пусты, — в том числе у старых постов в ленте.
+    """
+
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False,
+    )
+    image_format = models.CharField(
+        'Формат картинки', max_length=10, blank=True, editable=False,
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер картинки, байт', null=True, blank=True, editable=False,
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки', blank=True, editable=False,
+    )
+
+    class Meta:
+        abstract = True
+
+    def fill_image_fields(self):
+        """Читает сведения из файла; ``False``, если файл недоступен."""
+        metadata = describe(self.image) if self.image else None
+        (self.image_width, self.image_height, image_format,
+         self.image_size) = metadata or (None, None, None, None)
+        self.image_format = image_format or ''
+        self.image_placeholder = placeholder(self.image) if metadata else ''
+        return metadata is not None
+
+
+class RenderedText(models.Model):
+    """HTML текста поста, отрывка для лент и заголовок страницы поста.
+
+    ``text_html`` и ``excerpt_html`` — текст и его первые
+    ``EXCERPT_LENGTH`` символов, экранированные и с ``<br>`` вместо
+    переводов строк, как после ``linebreaksbr``; в шаблоне они выводятся
+    через ``safe``. ``title`` — первые ``TITLE_LENGTH`` символов текста.
+    """
+
+    text_html = models.TextField('HTML текста', blank=True, editable=False)
+    excerpt_html = models.TextField(
+        'HTML отрывка', blank=True, editable=False,
+    )
+    title = models.CharField(
+        'Заголовок', max_length=TITLE_LENGTH, blank=True, editable=False,
+    )
+
+    class Meta:
+        abstract = True
+
+    def render_text(self):
+        self.text_html = linebreaksbr(self.text, autoescape=True)
+        self.excerpt_html = linebreaksbr(
+            Truncator(self.text).chars(EXCERPT_LENGTH), autoescape=True,
+        )
+        self.title = Truncator(self.text).chars(TITLE_LENGTH)
 
+    @property
+    def summary(self):
+        """Отрывок для ленты; у незаполненных строк — из начала текста."""
+        if self.excerpt_html:
+            return mark_safe(self.excerpt_html)
+        return linebreaksbr(
+            Truncator(self.text).chars(EXCERPT_LENGTH), autoescape=True,
+        )
 
-class Post(models.Model):
+
+class PostQuerySet(models.QuerySet):
+
+    def feed(self):
+        """Посты для лент: без полного текста, с готовым ``summary``.
+
+        У постов, сохранённых в обход ``save`` (старые строки до
+        backfill_posts), отрывка нет — тогда ``summary`` дочитывает текст.
+        """
+        return self.defer(*BODY_FIELDS)
+
+    def as_feed(self):
+        """Лента как ``PostRow`` только с нужными карточке колонками.
+
+        См. ``posts/feed.py``; ``count`` и срезы для ``Paginator``
+        работают как у обычной выборки.
+        """
+        queryset = self.annotate(
+            text_start=self._text_start(),
+        ).values_list(*FEED_COLUMNS)
+        queryset._iterable_class = FeedIterable
+        return queryset
+
+    @staticmethod
+    def _text_start():
+        # Начало текста нужно только строкам без отрывка, у остальных
+        # база отдаёт пустую строку.
+        return Case(
+            When(excerpt_html='', then=Substr('text', 1, EXCERPT_LENGTH)),
+            default=Value(''),
+            output_field=TextField(),
+        )
+
+
+class Post(ImageMetadata, RenderedText):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
     )
     pub_date = models.DateTimeField(
         'Дата публикации',
-        auto_now_add=True
+        auto_now_add=True,
+        db_index=True
     )
     author = models.ForeignKey(
         User,
@@ -45,6 +172,8 @@ class Post(models.Model):
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ("-pub_date",)
         verbose_name = 'Пост'
@@ -53,6 +182,16 @@ class Post(models.Model):
     def __str__(self):
         return (self.text[:CHAR])
 
+    def save(self, *args, **kwargs):
+        # Файл читается только для новой загрузки и для постов, сведения
+        # о картинке которых ещё не заполнены.
+        if not self.image or not self.image._committed or (
+            self.image_width is None
+        ):
+            self.fill_image_fields()
+        self.render_text()
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
 
@@ -74,6 +213,7 @@ class Comment(models.Model):
     created = models.DateTimeField(
         'Дата комментария',
         auto_now_add=True,
+        db_index=True,
     )
 
 
@@ -103,3 +243,93 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - {self.author.username}'
+
+
+class Suggestion(models.Model):
+    """Рекомендованный автор, посчитанный командой compute_suggestions."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to',
+        verbose_name='Рекомендованный автор',
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique suggestion'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.author_id} ({self.score:.2f})'
+
+
+class ArchivedPost(ImageMetadata, RenderedText):
+    """Пост, перенесённый командой archive_posts из горячей таблицы.
+
+    id совпадает с id исходного поста, поэтому ссылки на пост не меняются.
+    """
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField('Текст поста')
+    pub_date = models.DateTimeField('Дата публикации', db_index=True)
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор',
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True, null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        verbose_name='Группа',
+    )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        storage=archive_storage,
+        blank=True,
+    )
+    archived = models.DateTimeField('Дата архивации', auto_now_add=True)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Архивный пост'
+        verbose_name_plural = 'Архивные посты'
+
+    def __str__(self):
+        return self.text[:CHAR]
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name='Автор',
+    )
+    text = models.TextField('Текст комментария')
+    created = models.DateTimeField('Дата комментария')
@@ -0,0 +1,93 @@
+"""Массовая модерация постов и комментариев.
+
+Операции выполняются наборными UPDATE/DELETE пачками по ``CHUNK_SIZE``
+строк, каждая пачка — в своей транзакции, так что блокировки держатся
+недолго, а объекты в память не загружаются. Функции — генераторы:
+после каждой пачки они отдают число обработанных строк, и вызывающий
+код может показывать прогресс.
+
+Сигналы при этом не посылаются, поэтому кэш лент групп и постов и
+ссылки на картинки удалённых постов обрабатываются здесь же.
+"""
+from django.db import router, transaction
+
+from core.storage import release
+
+from .cache import invalidate_group_archive, invalidate_group_posts
+from .lookups import post_by_id
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+CHUNK_SIZE = 1000
+# Модель постов -> модель их комментариев.
+COMMENTS = {Post: Comment, ArchivedPost: ArchivedComment}
+
+
+def chunked_pks(queryset, size=CHUNK_SIZE):
+    """id строк выборки пачками по возрастанию, без OFFSET."""
+    last = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last).order_by('pk')
+            .values_list('pk', flat=True)[:size]
+        )
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def _group_ids(pks, model=Post):
+    return set(
+        model.objects.filter(pk__in=pks)
+        .values_list('group_id', flat=True).distinct()
+    )
+
+
+def move_to_group(queryset, group, size=CHUNK_SIZE):
+    group_id = group.pk if group is not None else None
+    for pks in chunked_pks(queryset, size):
+        with transaction.atomic(using=router.db_for_write(Post)):
+            affected = _group_ids(pks)
+            Post.objects.filter(pk__in=pks).update(group_id=group_id)
+        invalidate_group_posts(group_id, *affected)
+        post_by_id.invalidate_many(pks)
+        yield len(pks)
+
+
+def delete_posts(queryset, size=CHUNK_SIZE):
+    """Удаляет посты вместе с комментариями, минуя ORM-каскад.
+
+    ``queryset`` — выборка ``Post`` или ``ArchivedPost``; картинки
+    отпускаются в хранилище своей модели. На пост ссылаются только
+    комментарии из ``COMMENTS``; новая модель со ссылкой на пост должна
+    удаляться здесь же.
+    """
+    model = queryset.model
+    comments = COMMENTS[model]
+    storage = model._meta.get_field('image').storage
+    using = router.db_for_write(model)
+    for pks in chunked_pks(queryset, size):
+        with transaction.atomic(using=using):
+            affected = _group_ids(pks, model)
+            images = list(
+                model.objects.filter(pk__in=pks).exclude(image='')
+                .values_list('image', flat=True)
+            )
+            comments.objects.filter(post_id__in=pks)._raw_delete(using)
+            deleted = model.objects.filter(pk__in=pks)._raw_delete(using)
+        if model is Post:
+            invalidate_group_posts(*affected)
+            post_by_id.invalidate_many(pks)
+        else:
+            invalidate_group_archive(*affected)
+        for name in images:
+            release(storage, name)
+        yield deleted
+
+
+def delete_comments(queryset, size=CHUNK_SIZE):
+    using = router.db_for_write(Comment)
+    for pks in chunked_pks(queryset, size):
+        with transaction.atomic(using=using):
+            deleted = Comment.objects.filter(pk__in=pks)._raw_delete(using)
+        yield deleted
@@ -0,0 +1,93 @@
+"""Пересборка миниатюр картинок постов на всех ядрах.
+
+Картинки читаются из базы пачками по id, а миниатюры из
+``THUMBNAIL_VARIANTS`` строятся в ``ProcessPoolExecutor``. В работе
+держится не больше ``MAX_PENDING`` заданий на процесс, поэтому память не
+растёт с числом постов. ``rebuild`` отдаёт задания в порядке id: после
+каждого все посты до его последнего id уже обработаны, и это место можно
+сохранить, чтобы продолжить прерванную пересборку.
+"""
+import multiprocessing
+from collections import deque
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from sorl.thumbnail import delete, get_thumbnail
+
+from .models import Post
+from .moderation import chunked_pks
+
+CHUNK_SIZE = 1000
+TASK_SIZE = 16
+MAX_PENDING = 4
+
+
+def rebuild_images(names, variants, force=False):
+    """Строит миниатюры картинок; возвращает ``(готово, не удалось)``."""
+    done, failed = 0, []
+    for name in names:
+        if force:
+            # Забываем старые миниатюры, иначе sorl отдаст их из kvstore.
+            delete(name, delete_file=False)
+        thumbnails = [
+            get_thumbnail(name, geometry, **options)
+            for geometry, options in variants
+        ]
+        # При ошибке чтения исходника sorl не бросает исключение, а
+        # возвращает несуществующую миниатюру.
+        if all(thumbnail.exists() for thumbnail in thumbnails):
+            done += 1
+        else:
+            failed.append(name)
+    return done, failed
+
+
+def _tasks(start, chunk_size):
+    queryset = Post.objects.exclude(image='').filter(pk__gt=start)
+    for pks in chunked_pks(queryset, chunk_size):
+        rows = list(
+            Post.objects.filter(pk__in=pks).order_by('pk')
+            .values_list('pk', 'image')
+        )
+        for i in range(0, len(rows), TASK_SIZE):
+            task = rows[i:i + TASK_SIZE]
+            yield task[-1][0], [name for _, name in task]
+
+
+def rebuild(workers=None, start=0, force=False, chunk_size=CHUNK_SIZE,
+            variants=None):
+    """Генератор ``(последний id, готово, не удалось)`` по заданиям.
+
+    ``workers=0`` — всё в текущем процессе, без пула.
+    """
+    variants = variants or settings.THUMBNAIL_VARIANTS
+    tasks = _tasks(start, chunk_size)
+    if workers == 0:
+        for last_pk, names in tasks:
+            yield (last_pk, *rebuild_images(names, variants, force))
+        return
+    workers = workers or multiprocessing.cpu_count()
+    first = next(tasks, None)
+    if first is None:
+        return
+    # Процессы наследуют настроенный Django через fork, и все они
+    # создаются при первом submit. Первая пачка уже прочитана, так что
+    # соединения с базой закрываются прямо перед ним: дочерние откроют
+    # свои, а родитель — новое, когда дойдёт до следующей пачки.
+    connections.close_all()
+    with ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context('fork'),
+    ) as pool:
+        pending = deque()
+        for last_pk, names in chain([first], tasks):
+            pending.append((last_pk, pool.submit(
+                rebuild_images, names, variants, force,
+            )))
+            while len(pending) >= workers * MAX_PENDING:
+                last, future = pending.popleft()
+                yield (last, *future.result())
+        while pending:
+            last, future = pending.popleft()
+            yield (last, *future.result())
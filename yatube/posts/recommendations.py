@@ -0,0 +1,170 @@
+"""Рекомендации авторов («на кого подписаться»).
+
+Оценки считаются пакетно командой ``compute_suggestions`` по всему графу
+подписок и активности в группах и сохраняются в таблицу ``Suggestion``.
+Запросы только читают готовый список из кэша (или одной выборкой из
+``Suggestion`` при промахе) и никогда не обходят граф.
+
+Граф хранится как разреженные матрицы в виде ``{строка: Counter}``:
+произведение таких матриц обходит только ненулевые элементы.
+"""
+from collections import Counter, defaultdict
+from math import log1p
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Follow, Post, Suggestion
+
+SUGGESTIONS_ON_PAGE = 5
+SUGGESTIONS_PER_USER = 20
+CACHE_KEY = 'suggestions:{user_id}'
+CACHE_TIMEOUT = 60 * 60
+CHUNK_SIZE = 2000
+
+# Веса слагаемых итоговой оценки.
+FRIENDS_OF_FRIENDS_WEIGHT = 1.0
+CO_FOLLOWING_WEIGHT = 0.5
+GROUP_WEIGHT = 0.2
+# Авторы с огромным числом подписчиков дают мало сигнала для
+# совместных подписок, а обход их подписчиков дорог.
+MAX_CO_FOLLOWERS = 500
+
+
+def _transpose(matrix):
+    result = defaultdict(Counter)
+    for row, columns in matrix.items():
+        for column, value in columns.items():
+            result[column][row] = value
+    return result
+
+
+def _multiply(left, right, exclude_diagonal=False, max_fanout=None):
+    """Произведение разреженных матриц ``left @ right``."""
+    result = defaultdict(Counter)
+    for row, columns in left.items():
+        acc = result[row]
+        for middle, value in columns.items():
+            right_row = right.get(middle)
+            if not right_row:
+                continue
+            if max_fanout is not None and len(right_row) > max_fanout:
+                continue
+            for column, other in right_row.items():
+                if exclude_diagonal and column == row:
+                    continue
+                acc[column] += value * other
+    return result
+
+
+def load_graph():
+    """Матрица подписок F[user][author] и активности G[author][group]."""
+    follows = defaultdict(Counter)
+    rows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in rows.iterator(chunk_size=CHUNK_SIZE):
+        follows[user_id][author_id] = 1
+
+    activity = defaultdict(Counter)
+    rows = (
+        Post.objects.exclude(group=None)
+        .values('author_id', 'group_id')
+        .annotate(posts=Count('id'))
+        .order_by()
+        .values_list('author_id', 'group_id', 'posts')
+    )
+    for author_id, group_id, posts in rows.iterator(chunk_size=CHUNK_SIZE):
+        activity[author_id][group_id] = log1p(posts)
+    return follows, activity
+
+
+def compute_scores(follows, activity):
+    """Считает оценки S = a·F² + b·(F·Fᵀ)·F + c·I·Gᵀ для всех пользователей.
+
+    F² — друзья друзей, (F·Fᵀ)·F — подписки пользователей с общими
+    подписками, I·Gᵀ — авторы, пишущие в интересных пользователю группах.
+    """
+    followers = _transpose(follows)
+    friends_of_friends = _multiply(follows, follows)
+    co_followers = _multiply(
+        follows, followers,
+        exclude_diagonal=True, max_fanout=MAX_CO_FOLLOWERS,
+    )
+    co_following = _multiply(co_followers, follows)
+    # Пользователь интересуется группами, в которых пишет сам
+    # и в которых пишут его авторы.
+    interests = _multiply(follows, activity)
+    for author_id, groups in activity.items():
+        interests[author_id].update(groups)
+    group_authors = _multiply(interests, _transpose(activity))
+
+    scores = defaultdict(Counter)
+    for matrix, weight in (
+        (friends_of_friends, FRIENDS_OF_FRIENDS_WEIGHT),
+        (co_following, CO_FOLLOWING_WEIGHT),
+        (group_authors, GROUP_WEIGHT),
+    ):
+        for user_id, columns in matrix.items():
+            acc = scores[user_id]
+            for author_id, value in columns.items():
+                acc[author_id] += weight * value
+
+    for user_id, acc in scores.items():
+        acc.pop(user_id, None)
+        for author_id in follows.get(user_id, ()):
+            acc.pop(author_id, None)
+    return scores
+
+
+def store_scores(scores, limit=SUGGESTIONS_PER_USER):
+    """Перезаписывает таблицу рекомендаций и сбрасывает кэш.
+
+    Кэш сбрасывается и тем, у кого рекомендации были, а теперь пропали.
+    """
+    with transaction.atomic():
+        user_ids = set(
+            Suggestion.objects.values_list('user_id', flat=True).distinct()
+        )
+        user_ids.update(scores)
+        Suggestion.objects.all().delete()
+        batch = []
+        for user_id, acc in scores.items():
+            for author_id, score in acc.most_common(limit):
+                batch.append(Suggestion(
+                    user_id=user_id, author_id=author_id, score=score,
+                ))
+            if len(batch) >= CHUNK_SIZE:
+                Suggestion.objects.bulk_create(batch)
+                batch = []
+        Suggestion.objects.bulk_create(batch)
+    keys = [CACHE_KEY.format(user_id=user_id) for user_id in user_ids]
+    for start in range(0, len(keys), CHUNK_SIZE):
+        cache.delete_many(keys[start:start + CHUNK_SIZE])
+    return sum(min(len(acc), limit) for acc in scores.values())
+
+
+def get_suggestions(user):
+    """Список пар (username, полное имя) рекомендованных авторов."""
+    if not user.is_authenticated:
+        return []
+    key = CACHE_KEY.format(user_id=user.pk)
+    suggestions = cache.get(key)
+    if suggestions is None:
+        rows = (
+            Suggestion.objects.filter(user=user)
+            .values_list(
+                'author__username', 'author__first_name', 'author__last_name'
+            )[:SUGGESTIONS_ON_PAGE]
+        )
+        suggestions = [
+            (username, f'{first_name} {last_name}'.strip() or username)
+            for username, first_name, last_name in rows
+        ]
+        cache.set(key, suggestions, CACHE_TIMEOUT)
+    return suggestions
+
+
+def forget_suggestion(user, author):
+    """Убирает автора из рекомендаций после подписки на него."""
+    Suggestion.objects.filter(user=user, author=author).delete()
+    cache.delete(CACHE_KEY.format(user_id=user.pk))
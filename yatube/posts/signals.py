@@ -0,0 +1,70 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.storage import release
+
+from . import trending
+from .cache import invalidate_group_posts
+from .lookups import post_by_id
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        trending.record_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        trending.record_follow(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    instance._previous_group_id = instance._previous_image = None
+    # Новый файл сохраняется в хранилище уже после сигнала; у того же
+    # содержимого имя не меняется, но ссылок на него становится больше.
+    instance._image_uploaded = (
+        bool(instance.image) and not instance.image._committed
+    )
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image')
+            .first()
+        ) or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, **kwargs):
+    invalidate_group_posts(
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    )
+    previous = getattr(instance, '_previous_image', None)
+    if previous and (
+        previous != instance.image.name
+        or getattr(instance, '_image_uploaded', False)
+    ):
+        release(instance.image.storage, previous)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_group_posts(instance.group_id)
+    release(instance.image.storage, instance.image.name)
+
+
+@receiver(pre_delete, sender=Group)
+def forget_group_posts(sender, instance, **kwargs):
+    # Посты группы получают group=NULL через UPDATE без сигналов.
+    post_by_id.invalidate_many(
+        instance.posts.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    invalidate_group_posts(instance.pk)
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass',
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count, prefix):
+        for i in range(count):
+            author = User.objects.create_user(username=f'{prefix}{i}')
+            post = Post.objects.create(
+                author=author, text=f'Пост {i}', group=self.group,
+            )
+            Comment.objects.create(post=post, author=author, text='Текст')
+            Follow.objects.create(user=author, author=self.admin)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списков в админке не зависит от числа строк."""
+        urls = [
+            reverse(f'admin:posts_{model}_changelist')
+            for model in ('post', 'comment', 'follow')
+        ]
+        self.add_rows(2, 'first')
+        # Первый запрос ещё кладёт в кэш сессию и пользователя.
+        self.queries(urls[0])
+        before = [self.queries(url) for url in urls]
+        self.add_rows(5, 'more')
+        self.assertEqual([self.queries(url) for url in urls], before)
+
+    def test_group_is_autocomplete(self):
+        """Группа в списке постов не рендерится полным списком групп."""
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}', description='-')
+            for i in range(5)
+        )
+        self.add_rows(1, 'user')
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, '<option value="5">')
+        self.assertContains(response, 'selected>Тестовая группа</option>')
@@ -0,0 +1,131 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.storage import InMemoryArchiveStorage, archive_storage
+from posts.archive import archive
+from posts.moderation import delete_posts
+from posts.models import ArchivedComment, ArchivedPost, Comment, Group, Post
+
+User = get_user_model()
+
+MEMORY_STORAGE = 'core.storage.InMemoryStorage'
+MEMORY_ARCHIVE_STORAGE = 'core.storage.InMemoryArchiveStorage'
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE=MEMORY_STORAGE,
+    ARCHIVE_FILE_STORAGE=MEMORY_ARCHIVE_STORAGE,
+    ARCHIVE_MEDIA_URL='/archive/',
+)
+class ArchiveTest(TransactionTestCase):
+    # Оригиналы картинок удаляются в on_commit, а TestCase транзакции не
+    # коммитит.
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.client = Client()
+        self.old = [
+            Post.objects.create(
+                author=self.user, text=f'Старый пост {i}', group=self.group,
+                image=SimpleUploadedFile(
+                    f'old{i}.gif', SMALL_GIF, 'image/gif'
+                ),
+            )
+            for i in range(3)
+        ]
+        for age, post in enumerate(self.old, start=100):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.now() - timedelta(days=age)
+            )
+        Comment.objects.create(
+            post=self.old[0], author=self.user, text='Старый комментарий',
+        )
+        self.hot = [
+            Post.objects.create(
+                author=self.user, text=f'Пост {i}', group=self.group,
+            )
+            for i in range(12)
+        ]
+
+    def test_archive_moves_posts_comments_and_images(self):
+        """Старые посты, комментарии и картинки переезжают в архив."""
+        self.assertEqual(sum(archive(days=30, size=2)), 3)
+        self.assertEqual(Post.objects.count(), 12)
+        self.assertEqual(ArchivedPost.objects.count(), 3)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(ArchivedComment.objects.get().post_id, self.old[0].pk)
+        archived = ArchivedPost.objects.get(pk=self.old[0].pk)
+        self.assertTrue(archived.image.url.startswith('/archive/'))
+        self.assertEqual(archived.image.read(), SMALL_GIF)
+        archived.image.close()
+        self.assertFalse(default_storage.exists(self.old[0].image.name))
+
+    def test_rollback_removes_copied_images(self):
+        """При откате пачки скопированные в архив картинки удаляются."""
+        before = set(InMemoryArchiveStorage.files)
+        with mock.patch.object(
+            ArchivedComment.objects, 'bulk_create', side_effect=RuntimeError,
+        ), self.assertRaises(RuntimeError):
+            list(archive(days=30))
+        self.assertEqual(set(InMemoryArchiveStorage.files), before)
+        self.assertEqual(Post.objects.count(), 15)
+        self.assertTrue(default_storage.exists(self.old[0].image.name))
+
+    def test_delete_archived_post_frees_image(self):
+        """Удаление архивного поста удаляет и копию его картинки."""
+        list(archive(days=30))
+        name = ArchivedPost.objects.get(pk=self.old[0].pk).image.name
+        self.assertTrue(archive_storage.exists(name))
+        list(delete_posts(ArchivedPost.objects.filter(pk=self.old[0].pk)))
+        self.assertFalse(archive_storage.exists(name))
+
+    def test_feeds_fall_through_to_archive(self):
+        """Лента профиля и группы продолжается архивными постами."""
+        list(archive(days=30))
+        expected = self.hot[::-1][10:] + self.old
+        for url in (
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count, 15
+                )
+                response = self.client.get(url, {'page': 2})
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    [post.pk for post in expected],
+                )
+
+    def test_archived_post_detail(self):
+        """Архивный пост открывается по прежнему адресу без формы."""
+        list(archive(days=30))
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.old[0].pk})
+        )
+        self.assertTrue(response.context['archived'])
+        self.assertContains(response, 'Старый комментарий')
+        self.assertNotContains(response, 'Добавить комментарий')
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from core.bloom import BloomFilter
+from core.models import StoredFile
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from posts.models import Post
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+User = get_user_model()
+
+
+def png(shade):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20), (shade, 0, 0)).save(buffer, 'PNG')
+    return SimpleUploadedFile(f'{shade}.png', buffer.getvalue(), 'image/png')
+
+
+class BloomFilterTest(SimpleTestCase):
+    def test_membership(self):
+        """Добавленное всегда находится, чужое — редко."""
+        bloom = BloomFilter(1000, 0.01)
+        bloom.update(f'posts/{i}.jpg' for i in range(1000))
+        self.assertTrue(all(f'posts/{i}.jpg' in bloom for i in range(1000)))
+        false = sum(f'cache/{i}.jpg' in bloom for i in range(1000))
+        self.assertLess(false, 50)
+
+
+class GarbageCollectorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.root = media.name
+        settings = override_settings(MEDIA_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.kept = Post.objects.create(
+            author=self.user, text='Пост', image=png(1),
+        )
+        self.thumbnail = get_thumbnail(self.kept.image, '8x4').name
+        deleted = Post.objects.create(
+            author=self.user, text='Пост', image=png(2),
+        )
+        self.stale_thumbnail = get_thumbnail(deleted.image, '8x4').name
+        # Удаление в обход сигналов: файл, его учёт и миниатюра остаются.
+        Post.objects.filter(pk=deleted.pk)._raw_delete('default')
+        self.orphan = deleted.image.name
+        # Файлы без учёта ссылок и без записей sorl.
+        self.legacy = self.write('posts/a.jpg')
+        self.unknown_thumbnail = self.write('cache/00/00/b.jpg')
+        self.age(self.kept.image.name, self.thumbnail, self.orphan,
+                 self.stale_thumbnail, self.legacy, self.unknown_thumbnail)
+
+    def write(self, name):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(b'image')
+        return name
+
+    def age(self, *names):
+        old = time.time() - 2 * 24 * 60 * 60
+        for name in names:
+            os.utime(os.path.join(self.root, name), (old, old))
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.root, name))
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_orphans_removed(self):
+        """Ненужные картинки и миниатюры удаляются, нужные остаются."""
+        fresh = default_storage.save('posts/fresh.jpg', png(4))
+        self.assertIn('Удалено файлов: 3', self.gc())
+        for name in (self.orphan, self.stale_thumbnail, self.legacy,
+                     self.unknown_thumbnail):
+            self.assertFalse(self.exists(name), name)
+        for name in (self.kept.image.name, self.thumbnail, fresh):
+            self.assertTrue(self.exists(name), name)
+        self.assertFalse(StoredFile.objects.filter(name=self.orphan).exists())
+        self.assertTrue(
+            StoredFile.objects.filter(name=self.kept.image.name).exists()
+        )
+
+    def test_dry_run_and_quarantine(self):
+        """Пробный запуск ничего не меняет, карантин сохраняет файлы."""
+        output = self.gc('--dry-run')
+        self.assertIn('Найдено файлов: 3', output)
+        self.assertIn(self.orphan, output)
+        self.assertTrue(self.exists(self.orphan))
+        quarantine = os.path.join(self.root, 'quarantine')
+        self.assertIn(
+            'Перенесено в карантин файлов: 3',
+            self.gc('--quarantine', quarantine),
+        )
+        self.assertFalse(self.exists(self.orphan))
+        self.assertTrue(os.path.exists(os.path.join(
+            quarantine, os.path.basename(self.root), self.orphan,
+        )))
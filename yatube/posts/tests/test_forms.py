@@ -1,20 +1,24 @@
-import shutil
-import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import IntegrityError
+from django.test import Client, SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
+from posts.comments import CommentBuffer, buffer
 from posts.forms import CommentForm, PostForm
 from posts.models import Comment, Group, Post
+from PIL import Image
 
 User = get_user_model()
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+MEMORY_STORAGE = 'core.storage.InMemoryStorage'
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(DEFAULT_FILE_STORAGE=MEMORY_STORAGE)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -112,11 +116,6 @@ class PostCreateFormTests(TestCase):
             'posts:post_detail', kwargs={'post_id': post.id}))
         self.assertEqual(expected, self.group2.pk)
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
 
 class CommentFormTest(TestCase):
     @classmethod
@@ -184,3 +183,175 @@ class CommentFormTest(TestCase):
             reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
         )
         self.assertIn(comment, response.context['comments'])
+
+
+@override_settings(DEFAULT_FILE_STORAGE=MEMORY_STORAGE, IMAGE_MAX_SIDE=100)
+class ImageIngestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def jpeg(self, size=(400, 200), orientation=6):
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        exif[0x010F] = 'Камера'
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(
+            buffer, 'JPEG', exif=exif.tobytes()
+        )
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост с картинкой', 'image': image},
+        )
+
+    def test_image_downscaled_and_stripped(self):
+        """Картинка уменьшается, поворачивается по EXIF и теряет EXIF."""
+        self.create(self.jpeg())
+        post = Post.objects.get()
+        with Image.open(post.image) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (50, 100))
+            self.assertFalse(image.getexif())
+        self.assertEqual((post.image_width, post.image_height), (50, 100))
+        self.assertEqual(post.image_format, 'JPEG')
+        self.assertEqual(post.image_size, post.image.size)
+
+    def test_identical_images_share_file(self):
+        """Одинаковые картинки хранятся одним файлом."""
+        self.create(self.jpeg())
+        self.create(self.jpeg())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_oversized_image_rejected(self):
+        """Картинка с огромным разрешением отклоняется до декодирования."""
+        response = self.create(self.jpeg())
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое разрешение картинки.',
+        )
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(COMMENT_RATE_LIMIT=(3, 60))
+class CommentGuardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Текст поста')
+        cls.url = reverse('posts:add_comment', kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_duplicate_comment_dropped(self):
+        """Повтор того же текста под постом не сохраняется."""
+        for text in ('Спам', '  спам ', 'Другой текст'):
+            self.authorized_client.post(self.url, {'text': text})
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Спам', 'Другой текст'],
+        )
+
+    def test_comment_flood_rate_limited(self):
+        """Сверх лимита комментарии отклоняются с кодом 429."""
+        for i in range(3):
+            response = self.authorized_client.post(
+                self.url, {'text': f'Комментарий {i}'}
+            )
+            self.assertEqual(response.status_code, 302)
+        response = self.authorized_client.post(self.url, {'text': 'Ещё'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_failed_comment_can_be_repeated(self):
+        """Незаписанный комментарий можно отправить ещё раз."""
+        with mock.patch.object(buffer, 'save', side_effect=IntegrityError):
+            response = self.authorized_client.post(self.url, {'text': 'Спам'})
+        self.assertEqual(response.status_code, 404)
+        self.authorized_client.post(self.url, {'text': 'Спам'})
+        self.assertEqual(Comment.objects.count(), 1)
+
+
+class RecordingBuffer(CommentBuffer):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def flush(self, comments):
+        self.batches.append(list(comments))
+        return {
+            index: ValueError(comment)
+            for index, comment in enumerate(comments) if comment < 0
+        }
+
+
+@override_settings(COMMENT_BUFFER_DELAY=0.5, COMMENT_BUFFER_SIZE=4)
+class CommentBufferTests(SimpleTestCase):
+    def test_concurrent_comments_flushed_together(self):
+        """Одновременные комментарии записываются одной пачкой."""
+        buffer = RecordingBuffer()
+        threads = [
+            threading.Thread(target=buffer.save, args=(i,)) for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(buffer.batches), 1)
+        self.assertCountEqual(buffer.batches[0], range(4))
+
+    def test_errors_reported_per_comment(self):
+        """Ошибку записи получает только запрос с плохой строкой."""
+        buffer = RecordingBuffer()
+        results = {}
+
+        def save(comment):
+            try:
+                buffer.save(comment)
+            except ValueError as error:
+                results[comment] = error
+            else:
+                results[comment] = None
+
+        threads = [
+            threading.Thread(target=save, args=(i,)) for i in (0, 1, -1, 2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(buffer.batches), 1)
+        self.assertEqual(
+            {comment for comment, error in results.items() if error}, {-1},
+        )
+
+
+class CommentFlushTests(TestCase):
+    def test_bad_row_does_not_fail_batch(self):
+        """Пачка с плохой строкой записывается по одной строке."""
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Текст поста')
+        errors = CommentBuffer().flush([
+            Comment(post=post, author=user, text='Первый'),
+            Comment(post=post, author=user, text=None),
+            Comment(post=post, author=user, text='Третий'),
+        ])
+        self.assertEqual(list(errors), [1])
+        self.assertIsInstance(errors[1], IntegrityError)
+        self.assertEqual(
+            sorted(Comment.objects.values_list('text', flat=True)),
+            ['Первый', 'Третий'],
+        )
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.cache import GROUP_POSTS_KEY
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+# Группа берётся из group_by_slug, а его кэш работает только с общим
+# бэкендом кэша (см. core/lookup.py).
+@override_settings(CACHED_LOOKUPS=True)
+class GroupCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Текст поста', group=cls.group,
+        )
+        cls.url = reverse('posts:group_posts', kwargs={'slug': 'test-slug'})
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_hot_group_page_uses_one_query(self):
+        """Горячая страница группы отдаётся одним запросом."""
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    def test_new_post_invalidates_group(self):
+        """Новый пост сразу появляется в ленте группы."""
+        self.client.get(self.url)
+        post = Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group,
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['page_obj'][0], post)
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+    def test_moved_post_leaves_old_group(self):
+        """Пост, перенесённый в другую группу, пропадает из старой."""
+        self.client.get(self.url)
+        self.post.group = self.other_group
+        self.post.save()
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_group_rename_and_delete(self):
+        """Смена slug и удаление группы сбрасывают кэш."""
+        self.client.get(self.url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'new-slug'
+        group.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        group.delete()
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': 'new-slug'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class GroupWithoutCacheTest(TestCase):
+    """С настройками по умолчанию лента группы в кэш не попадает."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.url = reverse('posts:group_posts', kwargs={'slug': 'test-slug'})
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_update_without_signals_is_visible(self):
+        """Пост, добавленный в группу без сигналов, виден сразу."""
+        post = Post.objects.create(author=self.user, text='Текст поста')
+        self.client.get(self.url)
+        Post.objects.filter(pk=post.pk).update(group=self.group)
+        response = self.client.get(self.url)
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.assertIsNone(cache.get(GROUP_POSTS_KEY.format(
+            group_id=self.group.pk,
+        )))
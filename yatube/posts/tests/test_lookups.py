@@ -0,0 +1,109 @@
+from core.checks import cached_lookups_cache
+from core.metrics import LOOKUP_CACHE
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.lookups import group_by_slug, post_by_id, user_by_username
+from posts.models import Group, Post
+from posts.moderation import delete_posts
+
+User = get_user_model()
+
+
+@override_settings(CACHED_LOOKUPS=True)
+class CachedLookupTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_hit_after_miss(self):
+        """Повторная выборка идёт из кэша и учитывается в метриках."""
+        hits = LOOKUP_CACHE.get(model='posts.Group', result='hit')
+        misses = LOOKUP_CACHE.get(model='posts.Group', result='miss')
+        self.assertEqual(group_by_slug.get('group'), self.group)
+        with self.assertNumQueries(0):
+            self.assertEqual(group_by_slug.get('group'), self.group)
+        self.assertEqual(
+            LOOKUP_CACHE.get(model='posts.Group', result='hit'), hits + 1,
+        )
+        self.assertEqual(
+            LOOKUP_CACHE.get(model='posts.Group', result='miss'), misses + 1,
+        )
+        self.assertIsNone(user_by_username.get('nobody'))
+
+    def test_invalidated_on_save_and_delete(self):
+        """Запись сбрасывается при сохранении, переименовании и удалении."""
+        group_by_slug.get('group')
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        self.assertIsNone(group_by_slug.get('group'))
+        self.assertEqual(group_by_slug.get('renamed').slug, 'renamed')
+        user_by_username.get('auth')
+        self.user.first_name = 'Иван'
+        self.user.save()
+        self.assertEqual(user_by_username.get('auth').first_name, 'Иван')
+        group.delete()
+        self.assertIsNone(group_by_slug.get('renamed'))
+        self.assertIsNone(post_by_id.get(self.post.pk).group)
+
+    @override_settings(CACHED_LOOKUPS=True,
+                       CACHED_LOOKUP_TIMEOUTS={'posts.Post': 0})
+    def test_per_model_timeout(self):
+        """Срок жизни записи задаётся для модели."""
+        post_by_id.get(self.post.pk)
+        with self.assertNumQueries(1):
+            post_by_id.get(self.post.pk)
+
+    def test_views_see_changes(self):
+        """Страницы не отдают удалённые в обход сигналов посты."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        list(delete_posts(Post.objects.filter(pk=self.post.pk)))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_write_views_read_database(self):
+        """Запись идёт в пост из базы, даже если кэш о нём не знает."""
+        self.client.force_login(self.user)
+        self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        # Удаление из другого процесса: локальный кэш его не увидит.
+        Post.objects.filter(pk=self.post.pk)._raw_delete('default')
+        self.assertIsNotNone(post_by_id.get(self.post.pk))
+        for name in ('posts:post_edit', 'posts:add_comment'):
+            response = self.client.post(
+                reverse(name, kwargs={'post_id': self.post.pk}),
+                {'text': 'Текст'},
+            )
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+
+    @override_settings(CACHED_LOOKUPS=False)
+    def test_disabled_without_shared_cache(self):
+        """Без CACHED_LOOKUPS выборки идут в базу, и проверка молчит."""
+        post_by_id.get(self.post.pk)
+        with self.assertNumQueries(1):
+            post_by_id.get(self.post.pk)
+        self.assertEqual(cached_lookups_cache(None), [])
+        with self.settings(CACHED_LOOKUPS=True):
+            self.assertEqual(
+                [error.id for error in cached_lookups_cache(None)],
+                ['core.W001'],
+            )
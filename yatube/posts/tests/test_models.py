@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 
-from ..models import CHAR, Group, Post
+from ..models import CHAR, TITLE_LENGTH, Group, Post
 
 User = get_user_model()
 
@@ -29,3 +34,109 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         expected_object_name_group = group.title
         self.assertEqual(expected_object_name_group, str(group))
+
+    def test_text_rendered_on_save(self):
+        """HTML текста и отрывка экранирован, заголовок обрезан."""
+        post = Post.objects.create(
+            author=self.user, text='<b>Жирный</b>\n' + 'слово ' * 100,
+        )
+        self.assertTrue(post.text_html.startswith(
+            '&lt;b&gt;Жирный&lt;/b&gt;<br>слово'
+        ))
+        self.assertTrue(post.excerpt_html.startswith(
+            '&lt;b&gt;Жирный&lt;/b&gt;<br>слово'
+        ))
+        self.assertTrue(post.excerpt_html.endswith('…'))
+        self.assertEqual(len(post.title), TITLE_LENGTH)
+        self.assertTrue(post.title.startswith('<b>Жирный</b>'))
+
+    def test_feed_escapes_unrendered_rows(self):
+        """Строки без HTML отрывка экранируются при чтении ленты."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text='<b>Старый</b>\nпост'),
+        ])
+        row = Post.objects.filter(text__startswith='<b>').as_feed()[0]
+        self.assertEqual(row.summary, '&lt;b&gt;Старый&lt;/b&gt;<br>пост')
+        post = Post.objects.feed().get(text__startswith='<b>')
+        self.assertEqual(post.summary, row.summary)
+
+    def test_feed_rows(self):
+        """Строки ленты — одним запросом, с общими автором и группой."""
+        posts = [
+            Post.objects.create(
+                author=self.user, group=self.group, text=f'Пост {i}',
+            )
+            for i in range(2)
+        ]
+        with self.assertNumQueries(1):
+            rows = list(Post.objects.filter(group=self.group).as_feed())
+        self.assertEqual(rows, posts[::-1])
+        row, other = rows
+        self.assertIs(row.author, other.author)
+        self.assertIs(row.group, other.group)
+        self.assertEqual(row.author, self.user)
+        self.assertEqual(row.group.slug, self.group.slug)
+        self.assertEqual(row.summary, posts[1].excerpt_html)
+        self.assertFalse(row.image)
+        with self.assertNumQueries(1):
+            self.assertEqual(row.text, posts[1].text)
+            self.assertEqual(row.text_html, posts[1].text_html)
+        self.assertFalse(hasattr(row, 'resolve_expression'))
+
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(DEFAULT_FILE_STORAGE='core.storage.InMemoryStorage')
+class ImageMetadataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_saved_with_post(self):
+        """Сведения о картинке заполняются при сохранении и сбрасываются."""
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=ContentFile(SMALL_GIF, name='small.gif'),
+        )
+        post.refresh_from_db()
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_format,
+             post.image_size),
+            (2, 1, 'GIF', len(SMALL_GIF)),
+        )
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        self.assertLess(len(post.image_placeholder), 1500)
+        post.image = None
+        post.save()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_format, '')
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_backfill(self):
+        """backfill_posts заполняет пустые сведения и терпит пропажу файла."""
+        name = default_storage.save('posts/small.gif', ContentFile(SMALL_GIF))
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Пост', image=name),
+            Post(author=self.user, text='Пост', image='posts/missing.gif'),
+            Post(author=self.user, text='Пост'),
+        ])
+        out = StringIO()
+        call_command('backfill_posts', stdout=out)
+        self.assertIn('Заполнено: 1, файл недоступен: 1', out.getvalue())
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'image_width', flat=True,
+            )),
+            [2, None, None],
+        )
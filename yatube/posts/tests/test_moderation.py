@@ -0,0 +1,137 @@
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import ArchivedComment, ArchivedPost, Comment, Group, Post
+
+User = get_user_model()
+
+
+class ModerationActionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass',
+        )
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.spam = [
+            Post.objects.create(
+                author=self.spammer, text=f'Спам {i}', group=self.group,
+            )
+            for i in range(3)
+        ]
+        self.post = Post.objects.create(
+            author=self.user, text='Текст поста', group=self.group,
+        )
+        Comment.objects.create(
+            post=self.post, author=self.spammer, text='Спам'
+        )
+        Comment.objects.create(
+            post=self.spam[0], author=self.user, text='Комментарий'
+        )
+
+    def run_action(self, model, action, objects, **extra):
+        return self.client.post(
+            reverse(f'admin:posts_{model}_changelist'),
+            {
+                'action': action,
+                helpers.ACTION_CHECKBOX_NAME: [obj.pk for obj in objects],
+                **extra,
+            },
+            follow=True,
+        )
+
+    def group_feed(self, group):
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': group.slug})
+        )
+        return list(response.context['page_obj'])
+
+    def test_move_to_group(self):
+        """Перенос в группу обновляет посты и кэш лент групп."""
+        self.assertEqual(len(self.group_feed(self.group)), 4)
+        response = self.run_action(
+            'post', 'move_to_group', self.spam[:2],
+            group=self.other_group.pk,
+        )
+        self.assertContains(response, 'постов: 2')
+        self.assertEqual(len(self.group_feed(self.group)), 2)
+        self.assertEqual(
+            {post.id for post in self.group_feed(self.other_group)},
+            {post.id for post in self.spam[:2]},
+        )
+
+    def test_move_requires_explicit_choice(self):
+        """Без группы и без «Без группы» посты не трогаются."""
+        response = self.run_action('post', 'move_to_group', self.spam[:2])
+        self.assertTemplateUsed(
+            response, 'admin/posts/post/move_to_group.html',
+        )
+        self.assertContains(response, 'Выберите группу')
+        self.assertEqual(
+            Post.objects.filter(group=self.group).count(), 4,
+        )
+        response = self.run_action(
+            'post', 'move_to_group', self.spam[:2], no_group='on',
+        )
+        self.assertContains(response, 'постов: 2')
+        self.assertEqual(Post.objects.filter(group=None).count(), 2)
+
+    def test_delete_author_posts(self):
+        """Удаляются все посты автора вместе с комментариями к ним."""
+        self.group_feed(self.group)
+        self.run_action('post', 'delete_author_posts', self.spam[:1])
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)), ['Спам']
+        )
+        self.assertEqual(self.group_feed(self.group), [self.post])
+
+    def test_delete_author_posts_in_archive(self):
+        """Архивные посты автора удаляются вместе с горячими."""
+        archived = ArchivedPost.objects.create(
+            id=1000, author=self.spammer, group=self.group,
+            text='Старый спам', pub_date=timezone.now(),
+        )
+        ArchivedComment.objects.create(
+            id=1000, post=archived, author=self.user,
+            text='Комментарий', created=timezone.now(),
+        )
+        kept = ArchivedPost.objects.create(
+            id=1001, author=self.user, text='Старый пост',
+            pub_date=timezone.now(),
+        )
+        response = self.run_action(
+            'post', 'delete_author_posts', self.spam[:1],
+        )
+        self.assertContains(response, 'постов авторов (1): 4')
+        self.assertEqual(list(ArchivedPost.objects.all()), [kept])
+        self.assertFalse(ArchivedComment.objects.exists())
+
+    def test_delete_author_comments(self):
+        """Удаляются все комментарии авторов выбранных комментариев."""
+        comment = Comment.objects.get(author=self.spammer)
+        self.run_action('comment', 'delete_author_comments', [comment])
+        self.assertEqual(
+            list(Comment.objects.values_list('author', flat=True)),
+            [self.user.pk],
+        )
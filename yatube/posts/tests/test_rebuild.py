@@ -0,0 +1,154 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from posts import rebuild
+from posts.models import Post
+from PIL import Image
+from sorl.thumbnail.models import KVStore
+
+User = get_user_model()
+
+MEMORY_STORAGE = 'core.storage.InMemoryStorage'
+
+
+def png(shade):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20), (shade, 0, 0)).save(buffer, 'PNG')
+    return SimpleUploadedFile(f'{shade}.png', buffer.getvalue(), 'image/png')
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE=MEMORY_STORAGE,
+    THUMBNAIL_VARIANTS=[('8x4', {'crop': 'center'})],
+)
+class RebuildMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        default_storage.files.clear()
+        self.posts = [
+            Post.objects.create(author=self.user, text='Пост', image=png(i))
+            for i in range(3)
+        ]
+        Post.objects.create(author=self.user, text='Пост без картинки')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, 'rebuild')
+
+    def thumbnails(self):
+        return [name for name in default_storage.files
+                if name.startswith('cache/')]
+
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command(
+            'rebuild_media', '--workers', '0', '--checkpoint', self.checkpoint,
+            *args, stdout=out, stderr=StringIO(),
+        )
+        return out.getvalue()
+
+    def test_rebuild_all(self):
+        """Миниатюры строятся для всех картинок, место остановки стирается."""
+        self.assertIn('Готово: 3, ошибок: 0', self.rebuild())
+        self.assertEqual(len(self.thumbnails()), 3)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_from_checkpoint(self):
+        """С сохранённого места обрабатываются только следующие посты."""
+        with open(self.checkpoint, 'w') as checkpoint:
+            checkpoint.write(str(self.posts[1].pk))
+        output = self.rebuild()
+        self.assertIn(f'Продолжение после поста {self.posts[1].pk}', output)
+        self.assertIn('Готово: 1, ошибок: 0', output)
+
+    def test_missing_image_reported(self):
+        """Пропавший исходник считается ошибкой, а не роняет команду."""
+        default_storage.delete(self.posts[0].image.name)
+        with self.assertLogs('sorl.thumbnail', 'ERROR'):
+            output = self.rebuild('--force')
+        self.assertIn('Готово: 2, ошибок: 1', output)
+
+
+@override_settings(THUMBNAIL_VARIANTS=[('8x4', {'crop': 'center'})])
+class RebuildMediaPoolTest(TransactionTestCase):
+    """Пересборка в пуле процессов.
+
+    Процессы получают копию памяти родителя через fork, поэтому всё общее
+    лежит в файлах: картинки и миниатюры — во временном MEDIA_ROOT, ключи
+    sorl — в тестовой базе (она файловая, см. settings.DATABASES), а посты
+    закоммичены до запуска пула.
+    """
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        settings = override_settings(
+            MEDIA_ROOT=os.path.join(self.root, 'media'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        user = User.objects.create_user(username='auth')
+        self.posts = [
+            Post.objects.create(author=user, text='Пост', image=png(i))
+            for i in range(6)
+        ]
+        self.checkpoint = os.path.join(self.root, 'rebuild')
+
+    def test_rebuild_in_pool(self):
+        """Миниатюры, построенные процессами, видны родителю."""
+        out = StringIO()
+        call_command(
+            'rebuild_media', '--workers', '2', '--checkpoint', self.checkpoint,
+            stdout=out, stderr=StringIO(),
+        )
+        self.assertIn('Готово: 6, ошибок: 0', out.getvalue())
+        cache_root = os.path.join(self.root, 'media', 'cache')
+        thumbnails = [
+            name for _, _, names in os.walk(cache_root) for name in names
+        ]
+        self.assertEqual(len(thumbnails), 6)
+        self.assertFalse(os.path.exists(self.checkpoint))
+        # Ключи sorl процессы записали в базу через свои соединения.
+        self.assertEqual(
+            KVStore.objects.filter(key__contains='||image||').count(), 12,
+        )
+
+    @mock.patch.object(rebuild, 'TASK_SIZE', 1)
+    @mock.patch.object(rebuild, 'MAX_PENDING', 1)
+    def test_pending_tasks_limited(self):
+        """На процесс не больше MAX_PENDING заданий, места идут по порядку."""
+        submit = ProcessPoolExecutor.submit
+        submitted, inherited = [], []
+
+        def count_submit(pool, *args, **kwargs):
+            # Процессы создаются при первом submit и не должны получить
+            # открытое соединение родителя.
+            if not submitted:
+                inherited.append(connection.connection)
+            submitted.append(args)
+            return submit(pool, *args, **kwargs)
+
+        checkpoints, in_flight = [], []
+        with mock.patch.object(ProcessPoolExecutor, 'submit', count_submit):
+            for last_pk, done, failed in rebuild.rebuild(workers=2):
+                in_flight.append(len(submitted) - len(checkpoints))
+                checkpoints.append(last_pk)
+        self.assertEqual(checkpoints, [post.pk for post in self.posts])
+        self.assertEqual(max(in_flight), 2)
+        self.assertEqual(inherited, [None])
@@ -0,0 +1,80 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Follow, Group, Post, Suggestion
+from posts.recommendations import (compute_scores, get_suggestions,
+                                   load_graph, store_scores)
+
+User = get_user_model()
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.friend_of_friend = User.objects.create_user(username='fof')
+        cls.neighbour = User.objects.create_user(username='neighbour')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.friend_of_friend)
+        Post.objects.create(
+            author=cls.user, text='Текст поста', group=cls.group,
+        )
+        Post.objects.create(
+            author=cls.neighbour, text='Текст поста', group=cls.group,
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_scores(self):
+        """Рекомендуются друзья друзей и соседи по группе."""
+        scores = compute_scores(*load_graph())[self.user.pk]
+        self.assertIn(self.friend_of_friend.pk, scores)
+        self.assertIn(self.neighbour.pk, scores)
+        self.assertNotIn(self.friend.pk, scores)
+        self.assertNotIn(self.user.pk, scores)
+        self.assertGreater(
+            scores[self.friend_of_friend.pk], scores[self.neighbour.pk]
+        )
+
+    def test_suggestions_served_from_cache(self):
+        """Рекомендации читаются из кэша без запросов к БД."""
+        call_command('compute_suggestions', stdout=StringIO())
+        get_suggestions(self.user)
+        with self.assertNumQueries(0):
+            suggestions = get_suggestions(self.user)
+        self.assertEqual(suggestions[0][0], self.friend_of_friend.username)
+
+    def test_dropped_user_cache_invalidated(self):
+        """Кэш сбрасывается и у того, кто остался без рекомендаций."""
+        call_command('compute_suggestions', stdout=StringIO())
+        self.assertTrue(get_suggestions(self.user))
+        store_scores({})
+        self.assertEqual(get_suggestions(self.user), [])
+
+    def test_follow_removes_suggestion(self):
+        """После подписки автор пропадает из рекомендаций."""
+        call_command('compute_suggestions', stdout=StringIO())
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.friend_of_friend.username}
+        ))
+        self.assertFalse(Suggestion.objects.filter(
+            user=self.user, author=self.friend_of_friend
+        ).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        usernames = [name for name, _ in response.context['suggestions']]
+        self.assertNotIn(self.friend_of_friend.username, usernames)
@@ -0,0 +1,136 @@
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from posts.models import (ArchivedComment, ArchivedPost, Comment, Follow,
+                          Group, Post)
+
+User = get_user_model()
+
+MEMORY_STORAGE = 'core.storage.InMemoryStorage'
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(DEFAULT_FILE_STORAGE=MEMORY_STORAGE)
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth', first_name='Иван',
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Текст поста,\nс "кавычками"',
+            group=cls.group,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        Post.objects.create(author=cls.reader, text='Пост без группы')
+        Post.objects.create(author=cls.reader, text='')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        archived = ArchivedPost.objects.create(
+            id=cls.post.pk + 100, author=cls.user, group=cls.group,
+            text='Архивный пост', text_html='Архивный пост',
+            pub_date=timezone.now(),
+        )
+        ArchivedComment.objects.create(
+            id=100, post=archived, author=cls.reader,
+            text='Архивный комментарий', created=timezone.now(),
+        )
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'id', 'author__username', 'author__first_name',
+                'group__slug', 'text', 'pub_date', 'image',
+            )),
+            list(Comment.objects.values_list(
+                'id', 'post_id', 'author__username', 'text', 'created',
+            )),
+            list(Follow.objects.values_list(
+                'user__username', 'author__username',
+            )),
+            list(ArchivedPost.objects.values_list(
+                'id', 'author__username', 'group__slug', 'text', 'pub_date',
+                'archived', 'text_html',
+            )),
+            list(ArchivedComment.objects.values_list(
+                'id', 'post_id', 'author__username', 'text', 'created',
+            )),
+        )
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка в обоих форматах восстанавливают данные."""
+        expected = self.snapshot()
+        for fmt in ('ndjson', 'csv'):
+            with self.subTest(fmt=fmt), \
+                    tempfile.TemporaryDirectory() as directory:
+                call_command(
+                    'export_posts', directory, format=fmt, stdout=StringIO()
+                )
+                self.post.image.delete(save=False)
+                Post.objects.all().delete()
+                Group.objects.all().delete()
+                User.objects.all().delete()
+                call_command(
+                    'import_posts', directory, format=fmt, batch_size=1,
+                    stdout=StringIO(),
+                )
+                self.assertEqual(self.snapshot(), expected)
+                post = Post.objects.get(pk=self.post.pk)
+                self.assertEqual(post.image.read(), SMALL_GIF)
+                call_command(
+                    'import_posts', directory, format=fmt, stdout=StringIO()
+                )
+                self.assertEqual(self.snapshot(), expected)
+
+    def test_taken_ids_are_refused(self):
+        """id, занятые в базе чужими постами, останавливают загрузку."""
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_posts', directory, stdout=StringIO())
+            Post.objects.all().delete()
+            Post.objects.create(
+                id=self.post.pk, author=self.reader, text='Чужой пост',
+            )
+            with self.assertRaisesMessage(CommandError, str(self.post.pk)):
+                call_command('import_posts', directory, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Чужой пост'],
+        )
+        self.assertFalse(Comment.objects.exists())
+
+    def test_archived_post_is_not_duplicated(self):
+        """Пост, ушедший в архив после выгрузки, не загружается снова."""
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                'export_posts', directory, no_media=True, stdout=StringIO(),
+            )
+            post = Post.objects.get(text='Пост без группы')
+            ArchivedPost.objects.create(
+                id=post.pk, author=post.author, text=post.text,
+                pub_date=post.pub_date,
+            )
+            Post.objects.filter(pk=post.pk).delete()
+            call_command('import_posts', directory, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertTrue(ArchivedPost.objects.filter(pk=post.pk).exists())
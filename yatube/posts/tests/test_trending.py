@@ -0,0 +1,80 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import trending
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.quiet_post = Post.objects.create(
+            author=cls.user, text='Тихий пост',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Популярный пост', group=cls.group,
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_comments_and_follows_raise_post(self):
+        """Комментарии и подписки поднимают пост и группу в рейтинге."""
+        Comment.objects.create(post=self.post, author=self.user, text='!')
+        Follow.objects.create(user=self.user, author=self.author)
+        ranking = trending.materialize()
+        self.assertEqual(ranking['posts'], [self.post.pk])
+        self.assertEqual(ranking['groups'], [self.group.pk])
+
+    def test_old_events_decay(self):
+        """Старые события весят меньше свежих."""
+        now = 10 ** 9
+        trending.record(self.quiet_post.pk, now=now - trending.HALF_LIFE * 2)
+        trending.record(self.quiet_post.pk, now=now - trending.HALF_LIFE * 2)
+        trending.record(self.post.pk, now=now)
+        ranking = trending.materialize(now=now)
+        self.assertEqual(ranking['posts'], [self.post.pk, self.quiet_post.pk])
+
+    def test_concurrent_records_not_lost(self):
+        """Одновременные события в одной корзине складываются без потерь."""
+        now = 10 ** 9
+
+        def worker():
+            for _ in range(50):
+                trending.record(self.post.pk, self.group.pk, now=now)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        bucket = trending._bucket(now)
+        for kind, pk in (('posts', self.post.pk), ('groups', self.group.pk)):
+            with self.subTest(kind=kind):
+                self.assertEqual(cache.get(trending.SCORE_KEY.format(
+                    bucket=bucket, kind=kind, pk=pk,
+                )), 400)
+        self.assertEqual(cache.get(trending.SIZE_KEY.format(bucket=bucket)), 2)
+
+    def test_trending_page_does_not_touch_comments(self):
+        """Страница популярного не агрегирует таблицу комментариев."""
+        Comment.objects.create(post=self.post, author=self.user, text='!')
+        trending.materialize()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        self.assertEqual(response.context['groups'], [self.group])
@@ -1,21 +1,25 @@
-import shutil
-import tempfile
+from unittest import mock
 
+from core.metrics import FEED_ROW_LOADS
+from core.storage import InMemoryStorage
 from django import forms
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from posts.feed import PostRow
 from posts.models import Follow, Group, Post
+from sorl.thumbnail import default as thumbnail_default
 
 User = get_user_model()
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+MEMORY_STORAGE = 'core.storage.InMemoryStorage'
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(DEFAULT_FILE_STORAGE=MEMORY_STORAGE)
 class PostViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -103,6 +107,81 @@ class PostViewsTests(TestCase):
                     self.assertEqual(key, value)
             self.assertContains(response, 'image')
 
+    def test_feed_shows_summary_without_text(self):
+        """Ленты не читают полный текст, страница поста выводит HTML."""
+        long_post = Post.objects.create(
+            author=self.user, text='Начало поста ' + 'текст ' * 100 + 'конец',
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        post = response.context['page_obj'][0]
+        self.assertIsInstance(post, PostRow)
+        self.assertEqual(post.summary, long_post.excerpt_html)
+        self.assertContains(response, long_post.excerpt_html)
+        self.assertNotContains(response, 'конец')
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': long_post.pk})
+        )
+        self.assertContains(response, 'конец')
+        self.assertContains(response, f' {long_post.title} ')
+
+    def test_feed_images_lazy_with_placeholder(self):
+        """Картинки ленты грузятся лениво поверх встроенной заглушки."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'loading="lazy" decoding="async"')
+        self.assertContains(
+            response, f'url({self.post.image_placeholder}) center / cover',
+        )
+
+    def test_feed_images_not_opened(self):
+        """Лента с готовыми миниатюрами не открывает файлы картинок.
+
+        Размеры исходника и миниатюры берутся из базы даже после
+        сброса хранилища ключей sorl.
+        """
+        author = User.objects.create_user(username='photographer')
+        post = Post.objects.create(
+            author=author, text='С картинкой', image=SimpleUploadedFile(
+                'small.gif', self.small_gif, 'image/gif',
+            ),
+        )
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        url = reverse('posts:profile', kwargs={'username': author.username})
+        expected = self.authorized_client.get(url).content
+        thumbnail_default.kvstore.clear()
+        with mock.patch.object(
+            InMemoryStorage, 'open', side_effect=AssertionError,
+        ) as storage_open:
+            self.assertEqual(self.authorized_client.get(url).content, expected)
+        storage_open.assert_not_called()
+
+    def test_feed_query_count_fixed(self):
+        """Число запросов ленты не растёт с числом постов на странице."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+
+        def queries(url):
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                self.authorized_client.get(url)
+            return len(captured)
+
+        loads = FEED_ROW_LOADS.get(model='posts.Post', attribute='text')
+        # Первый проход строит миниатюры.
+        for url in urls:
+            queries(url)
+        before = [queries(url) for url in urls]
+        Post.objects.bulk_create(
+            Post(author=self.post.author, group=self.group, text=f'Пост {i}')
+            for i in range(5)
+        )
+        self.assertEqual([queries(url) for url in urls], before)
+        self.assertEqual(
+            FEED_ROW_LOADS.get(model='posts.Post', attribute='text'), loads,
+        )
+
     def test_group_list_show_correct_context(self):
         """Шаблон 'group_list' сформирован с правильным контекстом."""
         response = self.authorized_client.get(reverse('posts:group_posts',
@@ -204,11 +283,6 @@ class PostViewsTests(TestCase):
         new_new_content = third_response.content
         self.assertNotEqual(old_content, new_new_content)
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
 
 class PaginatorViewsTest(TestCase):
 
@@ -381,3 +455,21 @@ class FollowViewTest(TestCase):
         response = self.authorized_client.get(reverse('posts:follow_index'))
         following_post = response.context['page_obj'][0].text
         self.assertEqual(following_post, self.post.text)
+
+    def test_profile_queries(self):
+        """Профиль собирается двумя запросами независимо от числа постов."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}', group=self.group)
+            for i in range(12)
+        )
+        url = reverse(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        self.assertFalse(response.context['following'])
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(url)
+        self.assertTrue(response.context['following'])
+        self.assertContains(response, 'Всего постов: 13')
@@ -0,0 +1,433 @@
+"""Выгрузка и загрузка контента в NDJSON или CSV.
+
+Каждая таблица — отдельный файл в каталоге выгрузки, картинки постов
+копируются в его подкаталог ``media``. Строки читаются через
+``.iterator(chunk_size=...)`` и пишутся пачками ``bulk_create``, поэтому
+расход памяти не зависит от размера базы.
+
+Архивные посты и комментарии выгружаются в свои таблицы, картинки
+архива — в тот же подкаталог ``media``. Горячие и архивные посты делят
+одно пространство id, так что пост, который после выгрузки успел уйти
+в архив, повторно не загружается.
+
+Пользователи и группы связываются по username и slug, посты и
+комментарии сохраняют свои id: повторная загрузка того же каталога
+ничего не дублирует. Если id из выгрузки в базе уже занят другим постом
+или комментарием (другой автор или дата), загрузка не начинается.
+"""
+import csv
+import json
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.management.color import no_style
+from django.db import connection
+from django.utils._os import safe_join
+from django.utils.dateparse import parse_datetime
+
+from .cache import invalidate_group_posts
+from .models import (IMAGE_FIELDS, ArchivedComment, ArchivedPost, Comment,
+                     Follow, Group, Post)
+
+User = get_user_model()
+
+CHUNK_SIZE = 1000
+FORMATS = ('ndjson', 'csv')
+MEDIA_DIR = 'media'
+
+# Таблица -> столбцы файла; порядок таблиц — порядок загрузки.
+TABLES = {
+    'users': ('username', 'first_name', 'last_name', 'email'),
+    'groups': ('slug', 'title', 'description'),
+    'posts': (
+        'id', 'author', 'group', 'text', 'pub_date', *IMAGE_FIELDS, 'image',
+    ),
+    'comments': ('id', 'post', 'author', 'text', 'created'),
+    'archived_posts': (
+        'id', 'author', 'group', 'text', 'pub_date', 'archived',
+        *IMAGE_FIELDS, 'image',
+    ),
+    'archived_comments': ('id', 'post', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+# Таблицы с картинками -> модель; картинка — последний столбец.
+IMAGES = {'posts': Post, 'archived_posts': ArchivedPost}
+# Столбцы, пустое значение которых в CSV означает NULL; в остальных
+# пустая строка остаётся пустой строкой.
+NULLABLE = {
+    'posts': ('group', 'image_width', 'image_height', 'image_size'),
+    'archived_posts': (
+        'group', 'image_width', 'image_height', 'image_size',
+    ),
+}
+
+
+class ConflictError(ValueError):
+    """id из выгрузки занят в базе другим объектом."""
+
+
+def _querysets():
+    return {
+        'users': User.objects.values_list(*TABLES['users']),
+        'groups': Group.objects.values_list(*TABLES['groups']),
+        'posts': Post.objects.values_list(
+            'id', 'author__username', 'group__slug', 'text', 'pub_date',
+            *IMAGE_FIELDS, 'image',
+        ),
+        'comments': Comment.objects.values_list(
+            'id', 'post_id', 'author__username', 'text', 'created',
+        ),
+        'archived_posts': ArchivedPost.objects.values_list(
+            'id', 'author__username', 'group__slug', 'text', 'pub_date',
+            'archived', *IMAGE_FIELDS, 'image',
+        ),
+        'archived_comments': ArchivedComment.objects.values_list(
+            'id', 'post_id', 'author__username', 'text', 'created',
+        ),
+        'follows': Follow.objects.values_list(
+            'user__username', 'author__username',
+        ),
+    }
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def write_rows(path, fields, rows, fmt):
+    """Записывает строки в файл и возвращает их число."""
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        if fmt == 'csv':
+            writer = csv.writer(output)
+            writer.writerow(fields)
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+        else:
+            for row in rows:
+                output.write(json.dumps(
+                    dict(zip(fields, row)),
+                    ensure_ascii=False, default=_isoformat,
+                ))
+                output.write('\n')
+                written += 1
+    return written
+
+
+def read_rows(path, fmt, nullable=()):
+    """Словари строк файла.
+
+    Пустые значения CSV в столбцах ``nullable`` превращаются в ``None``.
+    """
+    with open(path, encoding='utf-8', newline='') as source:
+        if fmt == 'csv':
+            csv.field_size_limit(sys.maxsize)
+            for row in csv.DictReader(source):
+                yield {
+                    key: None if key in nullable and value == '' else value
+                    for key, value in row.items()
+                }
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _storage(model):
+    return model._meta.get_field('image').storage
+
+
+def _export_images(rows, root, storage):
+    for row in rows:
+        name = row[-1]
+        if name:
+            target = safe_join(root, name)
+            if not os.path.exists(target):
+                try:
+                    with storage.open(name) as source:
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        with open(target, 'wb') as output:
+                            shutil.copyfileobj(source, output)
+                except FileNotFoundError:
+                    pass
+        yield row
+
+
+def dump(directory, fmt='ndjson', chunk_size=CHUNK_SIZE, media=True):
+    """Выгружает все таблицы в ``directory``; возвращает число строк."""
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for table, queryset in _querysets().items():
+        rows = queryset.order_by('pk').iterator(chunk_size=chunk_size)
+        if table in IMAGES and media:
+            rows = _export_images(
+                rows, os.path.join(directory, MEDIA_DIR),
+                _storage(IMAGES[table]),
+            )
+        counts[table] = write_rows(
+            os.path.join(directory, f'{table}.{fmt}'), TABLES[table], rows,
+            fmt,
+        )
+    return counts
+
+
+@contextmanager
+def _original_dates(model):
+    # Иначе bulk_create перезапишет даты из файла текущим временем.
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _user_ids(usernames):
+    """id пользователей по username; недостающие создаются без пароля."""
+    usernames = set(usernames)
+    ids = dict(
+        User.objects.filter(username__in=usernames)
+        .values_list('username', 'id')
+    )
+    missing = usernames - ids.keys()
+    if missing:
+        User.objects.bulk_create(
+            [User(username=name, password=make_password(None))
+             for name in missing],
+            ignore_conflicts=True,
+        )
+        ids.update(
+            User.objects.filter(username__in=missing)
+            .values_list('username', 'id')
+        )
+    return ids
+
+
+def _load_users(rows, directory):
+    User.objects.bulk_create(
+        [User(username=row['username'],
+              first_name=row['first_name'] or '',
+              last_name=row['last_name'] or '',
+              email=row['email'] or '',
+              password=make_password(None))
+         for row in rows],
+        ignore_conflicts=True,
+    )
+
+
+def _load_groups(rows, directory):
+    Group.objects.bulk_create(
+        [Group(slug=row['slug'], title=row['title'],
+               description=row['description'] or '')
+         for row in rows],
+        ignore_conflicts=True,
+    )
+
+
+def _import_image(name, directory, storage):
+    if not name:
+        return ''
+    source = safe_join(os.path.join(directory, MEDIA_DIR), name)
+    if os.path.exists(source):
+        with open(source, 'rb') as image:
+            name = storage.save(name, File(image))
+    return name
+
+
+# Модели, которые делят пространство id: горячая и архивная таблица.
+SHARED_IDS = {
+    Post: (Post, ArchivedPost),
+    ArchivedPost: (Post, ArchivedPost),
+    Comment: (Comment, ArchivedComment),
+    ArchivedComment: (Comment, ArchivedComment),
+}
+
+
+def _existing(model, pks):
+    """id из ``pks``, занятые в горячей или архивной таблице."""
+    return {
+        pk
+        for shared in SHARED_IDS[model]
+        for pk in shared.objects.filter(pk__in=pks)
+        .values_list('pk', flat=True)
+    }
+
+
+def _number(value):
+    return None if value is None else int(value)
+
+
+def _load_posts(rows, directory, model=Post):
+    authors = _user_ids(row['author'] for row in rows)
+    groups = dict(
+        Group.objects.filter(slug__in={row['group'] for row in rows})
+        .values_list('slug', 'id')
+    )
+    storage = _storage(model)
+    # Картинки сохраняются только для новых постов: хранилище считает
+    # ссылки, и повторная загрузка не должна их добавлять.
+    existing = _existing(model, {int(row['id']) for row in rows})
+    posts = []
+    for row in rows:
+        if int(row['id']) in existing:
+            continue
+        post = model(
+            id=int(row['id']),
+            author_id=authors[row['author']],
+            group_id=groups.get(row['group']),
+            text=row['text'],
+            pub_date=parse_datetime(row['pub_date']),
+            image=_import_image(row['image'], directory, storage),
+            # В выгрузках до появления этих столбцов их нет; такие посты
+            # заполняет команда backfill_posts.
+            image_width=_number(row.get('image_width')),
+            image_height=_number(row.get('image_height')),
+            image_format=row.get('image_format') or '',
+            image_size=_number(row.get('image_size')),
+            image_placeholder=row.get('image_placeholder') or '',
+        )
+        if 'archived' in row:
+            post.archived = parse_datetime(row['archived'])
+        # bulk_create минует Post.save, HTML текста готовится здесь.
+        post.render_text()
+        posts.append(post)
+    with _original_dates(model):
+        model.objects.bulk_create(posts, ignore_conflicts=True)
+
+
+def _load_comments(rows, directory, model=Comment):
+    authors = _user_ids(row['author'] for row in rows)
+    # Комментарии к постам, которых нет в базе, пропускаются.
+    posts = set(
+        model._meta.get_field('post').related_model.objects
+        .filter(pk__in={int(row['post']) for row in rows})
+        .values_list('pk', flat=True)
+    )
+    existing = _existing(model, {int(row['id']) for row in rows})
+    comments = [
+        model(
+            id=int(row['id']),
+            post_id=int(row['post']),
+            author_id=authors[row['author']],
+            text=row['text'],
+            created=parse_datetime(row['created']),
+        )
+        for row in rows
+        if int(row['post']) in posts and int(row['id']) not in existing
+    ]
+    with _original_dates(model):
+        model.objects.bulk_create(comments, ignore_conflicts=True)
+
+
+def _load_follows(rows, directory):
+    users = _user_ids(
+        name for row in rows for name in (row['user'], row['author'])
+    )
+    Follow.objects.bulk_create(
+        [Follow(user_id=users[row['user']], author_id=users[row['author']])
+         for row in rows if row['user'] != row['author']],
+        ignore_conflicts=True,
+    )
+
+
+LOADERS = {
+    'users': _load_users,
+    'groups': _load_groups,
+    'posts': _load_posts,
+    'comments': _load_comments,
+    'archived_posts': partial(_load_posts, model=ArchivedPost),
+    'archived_comments': partial(_load_comments, model=ArchivedComment),
+    'follows': _load_follows,
+}
+
+
+# Таблица -> (модель, поле даты) для проверки занятых id: объект с тем
+# же id, автором и датой считается уже загруженным — в том числе если
+# он с тех пор переехал в архив или из него.
+IDENTIFIED = {
+    'posts': (Post, 'pub_date'),
+    'comments': (Comment, 'created'),
+    'archived_posts': (ArchivedPost, 'pub_date'),
+    'archived_comments': (ArchivedComment, 'created'),
+}
+
+
+def _conflicts(table, rows):
+    model, date = IDENTIFIED[table]
+    rows = {int(row['id']): row for row in rows}
+    for shared in SHARED_IDS[model]:
+        for pk, author, value in shared.objects.filter(
+            pk__in=rows,
+        ).values_list('pk', 'author__username', date):
+            row = rows[pk]
+            if (author, value) != (
+                row['author'], parse_datetime(row[date]),
+            ):
+                yield pk
+
+
+def check_conflicts(directory, fmt='ndjson', batch_size=CHUNK_SIZE):
+    """Бросает ``ConflictError``, если id выгрузки заняты в базе.
+
+    ``bulk_create`` с ``ignore_conflicts`` молча пропустил бы такие
+    строки, а комментарии попали бы к чужим постам.
+    """
+    for table in IDENTIFIED:
+        path = os.path.join(directory, f'{table}.{fmt}')
+        if not os.path.exists(path):
+            continue
+        for batch in batches(read_rows(path, fmt), batch_size):
+            taken = list(_conflicts(table, batch))
+            if taken:
+                raise ConflictError(
+                    f'{table}: id уже заняты другими объектами: '
+                    + ', '.join(map(str, taken[:10]))
+                )
+
+
+def load(directory, fmt='ndjson', batch_size=CHUNK_SIZE):
+    """Загружает выгрузку из ``directory``; возвращает число строк."""
+    check_conflicts(directory, fmt, batch_size)
+    counts = {}
+    for table, loader in LOADERS.items():
+        path = os.path.join(directory, f'{table}.{fmt}')
+        if not os.path.exists(path):
+            continue
+        counts[table] = 0
+        rows = read_rows(path, fmt, NULLABLE.get(table, ()))
+        for batch in batches(rows, batch_size):
+            loader(batch, directory)
+            counts[table] += len(batch)
+    # id вставлены явно — счётчики автоинкремента нужно подвинуть.
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment]
+        ):
+            cursor.execute(sql)
+    # bulk_create не посылает сигналов, кэш лент групп сбрасывается здесь.
+    invalidate_group_posts(
+        *Group.objects.values_list('pk', flat=True).iterator()
+    )
+    return counts
@@ -0,0 +1,124 @@
+"""Популярные посты и группы.
+
+Каждый новый комментарий или подписка добавляет вес в корзину скользящего
+окна (одна корзина на ``BUCKET_SECONDS``), корзины живут в кэше.
+Вес каждого поста и группы в корзине — отдельный целый счётчик, который
+создаётся ``cache.add`` и растёт через ``cache.incr``, так что
+одновременные события не теряются. Новый счётчик получает номер слота
+корзины, по слотам рейтинг находит счётчики. Периодически корзины окна
+сворачиваются с экспоненциальным затуханием в готовый отсортированный
+рейтинг, который и читает страница ``trending``.
+Таблица комментариев при чтении не агрегируется.
+"""
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+from .models import Post
+
+BUCKET_SECONDS = 10 * 60
+WINDOW_BUCKETS = 24 * 6
+HALF_LIFE = 6 * 60 * 60
+MATERIALIZE_INTERVAL = 60
+TRENDING_SIZE = 100
+TRENDING_GROUPS = 5
+
+# Веса целые: их складывает cache.incr.
+COMMENT_WEIGHT = 1
+FOLLOW_WEIGHT = 2
+BUCKET_TIMEOUT = BUCKET_SECONDS * (WINDOW_BUCKETS + 1)
+
+SIZE_KEY = 'trending:bucket:{bucket}:size'
+SLOT_KEY = 'trending:bucket:{bucket}:slot:{slot}'
+SCORE_KEY = 'trending:bucket:{bucket}:{kind}:{pk}'
+RANKING_KEY = 'trending:ranking'
+
+
+def _bucket(now):
+    return int(now // BUCKET_SECONDS)
+
+
+def _add(bucket, kind, pk, weight):
+    key = SCORE_KEY.format(bucket=bucket, kind=kind, pk=pk)
+    if cache.add(key, weight, BUCKET_TIMEOUT):
+        size_key = SIZE_KEY.format(bucket=bucket)
+        cache.add(size_key, 0, BUCKET_TIMEOUT)
+        slot = cache.incr(size_key)
+        cache.set(
+            SLOT_KEY.format(bucket=bucket, slot=slot), (kind, pk),
+            BUCKET_TIMEOUT,
+        )
+        return
+    try:
+        cache.incr(key, weight)
+    except ValueError:
+        # Счётчик истёк между add и incr — корзина уже вне окна.
+        pass
+
+
+def record(post_id, group_id=None, weight=1, now=None):
+    """Добавляет вес посту и его группе в текущую корзину окна."""
+    bucket = _bucket(time.time() if now is None else now)
+    _add(bucket, 'posts', post_id, weight)
+    if group_id is not None:
+        _add(bucket, 'groups', group_id, weight)
+
+
+def record_comment(comment):
+    record(comment.post_id, comment.post.group_id, COMMENT_WEIGHT)
+
+
+def record_follow(follow):
+    """Подписка на автора поднимает его последний пост."""
+    latest = (
+        Post.objects.filter(author_id=follow.author_id)
+        .values_list('id', 'group_id')
+        .first()
+    )
+    if latest is not None:
+        record(*latest, weight=FOLLOW_WEIGHT)
+
+
+def materialize(now=None):
+    """Сворачивает корзины окна в рейтинг и кладёт его в кэш."""
+    now = time.time() if now is None else now
+    current = _bucket(now)
+    buckets = range(current - WINDOW_BUCKETS + 1, current + 1)
+    sizes = cache.get_many(
+        [SIZE_KEY.format(bucket=bucket) for bucket in buckets]
+    )
+    slots = {
+        SLOT_KEY.format(bucket=bucket, slot=slot): bucket
+        for bucket in buckets
+        for slot in range(
+            1, sizes.get(SIZE_KEY.format(bucket=bucket), 0) + 1
+        )
+    }
+    members = {}
+    for key, (kind, pk) in cache.get_many(list(slots)).items():
+        bucket = slots[key]
+        members[SCORE_KEY.format(bucket=bucket, kind=kind, pk=pk)] = (
+            bucket, kind, pk,
+        )
+    totals = {'posts': Counter(), 'groups': Counter()}
+    for key, weight in cache.get_many(list(members)).items():
+        bucket, kind, pk = members[key]
+        decay = 0.5 ** ((current - bucket) * BUCKET_SECONDS / HALF_LIFE)
+        totals[kind][pk] += weight * decay
+    posts, groups = totals['posts'], totals['groups']
+    ranking = {
+        'posts': [pk for pk, _ in posts.most_common(TRENDING_SIZE)],
+        'groups': [pk for pk, _ in groups.most_common(TRENDING_SIZE)],
+        'at': now,
+    }
+    cache.set(RANKING_KEY, ranking, None)
+    return ranking
+
+
+def get_ranking():
+    """Готовый рейтинг; пересчитывается не чаще MATERIALIZE_INTERVAL."""
+    ranking = cache.get(RANKING_KEY)
+    if ranking is None or time.time() - ranking['at'] > MATERIALIZE_INTERVAL:
+        ranking = materialize()
+    return ranking
@@ -1,11 +1,26 @@
+from http import HTTPStatus
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import DatabaseError, IntegrityError
+from django.db.models import (BooleanField, Count, Exists, OuterRef,
+                              Subquery, Value)
+from django.db.models.functions import Coalesce
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.cache import cache_page
 
+from core import identity
+
+from . import comments
+from .archive import TieredPosts, archived_group_count
+from .cache import GroupPostWindow
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .lookups import group_by_slug, post_by_id
+from .models import ArchivedPost, Follow, Group, Post
+from .recommendations import forget_suggestion, get_suggestions
+from .trending import TRENDING_GROUPS, get_ranking
 
 User = get_user_model()
 
@@ -15,7 +30,7 @@ POSTS_ON_PAGE = 10
 @cache_page(20 * 1)
 def index(request):
     main = 'Последние обновления на сайте'
-    latest = Post.objects.select_related('group')
+    latest = Post.objects.as_feed()
     paginator = Paginator(latest, POSTS_ON_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
@@ -28,9 +43,37 @@ def index(request):
     return render(request, template, context)
 
 
+def trending(request):
+    ranking = get_ranking()
+    posts = {
+        post.id: post for post in
+        Post.objects.filter(pk__in=ranking['posts']).as_feed()
+    }
+    groups = Group.objects.in_bulk(ranking['groups'][:TRENDING_GROUPS])
+    paginator = Paginator(
+        [posts[pk] for pk in ranking['posts'] if pk in posts],
+        POSTS_ON_PAGE
+    )
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    template = 'posts/trending.html'
+    context = {
+        'text': 'Популярное',
+        'page_obj': page_obj,
+        'groups': [groups[pk] for pk in ranking['groups'] if pk in groups],
+        'trending': True,
+    }
+    return render(request, template, context)
+
+
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    group = group_by_slug.get_or_404(slug)
+    window = GroupPostWindow(group, POSTS_ON_PAGE)
+    posts = TieredPosts(
+        window, window.count(),
+        group.archived_posts.as_feed(),
+        archived_group_count(group),
+    )
     paginator = Paginator(posts, POSTS_ON_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
@@ -43,16 +86,34 @@ def group_posts(request, slug):
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    # Автор, число его постов (горячих и архивных) и подписка текущего
+    # пользователя — одним запросом; второй запрос — сама страница постов.
     user = request.user
-    if (
-        user.is_authenticated and author != request.user
-        and Follow.objects.filter(author=author, user=request.user).exists()
-    ):
-        following = True
+    if user.is_authenticated:
+        following = Exists(
+            Follow.objects.filter(author=OuterRef('pk'), user=user)
+        )
     else:
-        following = False
-    post_list = author.posts.all()
+        following = Value(False, output_field=BooleanField())
+    archived = (
+        ArchivedPost.objects.filter(author=OuterRef('pk')).order_by()
+        .values('author').annotate(count=Count('pk')).values('count')
+    )
+    author = get_object_or_404(
+        User.objects.annotate(
+            hot_count=Count('posts'),
+            archived_count=Coalesce(Subquery(archived), 0),
+            is_following=following,
+        ),
+        username=username,
+    )
+    author.posts_count = author.hot_count + author.archived_count
+    post_list = TieredPosts(
+        author.posts.as_feed(),
+        author.hot_count,
+        author.archived_posts.as_feed(),
+        author.archived_count,
+    )
     paginator = Paginator(post_list, POSTS_ON_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
@@ -60,20 +121,28 @@ def profile(request, username):
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
+        'following': author.is_following and author != user,
+        'suggestions': get_suggestions(user),
     }
     return render(request, template, context)
 
 
 def post_detail(request, post_id):
     form = CommentForm()
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = post_by_id.get(post_id)
+    archived = post is None
+    if archived:
+        post = get_object_or_404(ArchivedPost, id=post_id)
+    # Автор поста, авторы комментариев и request.user — одни и те же
+    # экземпляры из карты идентичности запроса.
+    identity.attach([post], 'author', 'group')
+    comments = identity.attach(post.comments.all(), 'author')
     template = 'posts/post_detail.html'
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'archived': archived,
     }
     return render(request, template, context)
 
@@ -95,7 +164,9 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     template_name = 'posts/create_post.html'
-    post = get_object_or_404(Post, id=post_id)
+    # Изменяемые объекты читаются из базы, а не из кэша post_by_id: запись
+    # в кэше может пережить перенос поста в архив.
+    post = get_object_or_404(Post, pk=post_id)
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
                     instance=post)
@@ -110,13 +181,24 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    form = CommentForm(request.POST or None)
+    post = get_object_or_404(Post, pk=post_id)
+    form = CommentForm(request.POST or None, author=request.user, post=post)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        try:
+            comments.buffer.save(comment)
+        except DatabaseError as error:
+            form.forget()
+            if isinstance(error, IntegrityError):
+                # Пост удалили, пока комментарий ждал записи.
+                raise Http404('Пост не найден')
+            raise
+    elif form.rate_limited:
+        return render(
+            request, 'core/429.html', status=HTTPStatus.TOO_MANY_REQUESTS
+        )
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -125,7 +207,7 @@ def follow_index(request):
     text = 'Избранные авторы'
     name = request.user
     authors = name.follower.all().values('author')
-    post_list = Post.objects.filter(author__in=authors)
+    post_list = Post.objects.filter(author__in=authors).as_feed()
 
     paginator = Paginator(post_list, POSTS_ON_PAGE)
     page_number = request.GET.get('page')
@@ -135,6 +217,7 @@ def follow_index(request):
         'text': text,
         'page_obj': page_obj,
         'follow': True,
+        'suggestions': get_suggestions(request.user),
     }
     return render(request, template, context)
 
@@ -146,6 +229,7 @@ def profile_follow(request, username):
     following = Follow.objects.filter(user=user, author=author)
     if request.user != author and not following.exists():
         Follow.objects.create(user=request.user, author=author)
+        forget_suggestion(request.user, author)
         return redirect('posts:profile', username=username)
 
     return redirect('posts:profile', username=author)
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from core import identity
+
+USER_KEY = 'auth:user:{pk}'
+# Даже с общим кэшем срок жизни ограничивает устаревание после изменений
+# без сигналов (QuerySet.update).
+USER_CACHE_TIMEOUT = 5 * 60
+
+
+def invalidate_user(pk):
+    cache.delete(USER_KEY.format(pk=pk))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кэша.
+
+    Запись сбрасывается при любом сохранении или удалении пользователя
+    (см. users/signals.py), в том числе при входе и смене пароля.
+    Пользователь кладётся в карту идентичности запроса.
+
+    Как и ``CachedLookup``, кэш включается настройкой ``CACHED_LOOKUPS``:
+    с локальным кэшем процесса сброс при смене пароля не дошёл бы до
+    других воркеров, и старая сессия жила бы дальше.
+    """
+
+    def get_user(self, user_id):
+        if not settings.CACHED_LOOKUPS:
+            return identity.add(super().get_user(user_id))
+        key = USER_KEY.format(pk=user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+        return identity.add(user)
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
+from django.core.exceptions import ValidationError
+
+from core.ratelimit import consume
 
 User = get_user_model()
 
@@ -8,3 +12,31 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class LoginForm(AuthenticationForm):
+    """Форма входа с ограничением частоты попыток по IP и логину.
+
+    Лимит проверяется до ``authenticate``, так что отклонённая попытка
+    не тратит время на проверку хеша пароля.
+    """
+
+    error_messages = {
+        **AuthenticationForm.error_messages,
+        'rate_limited': 'Слишком много попыток входа. Попробуйте позже.',
+    }
+    rate_limited = False
+
+    def clean(self):
+        username = self.cleaned_data.get('username') or ''
+        limits = settings.LOGIN_RATE_LIMITS
+        ip = self.request.META.get('REMOTE_ADDR') if self.request else None
+        if not (
+            consume('login-ip', ip, *limits['ip'])
+            and consume('login-user', username.lower(), *limits['username'])
+        ):
+            self.rate_limited = True
+            raise ValidationError(
+                self.error_messages['rate_limited'], code='rate_limited',
+            )
+        return super().clean()
@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+
+User = get_user_model()
+
+PASSWORD = 'bench-Pa55word'
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет скорость проверки пароля каждым хешером из '
+        'PASSWORD_HASHERS и число входов в секунду на одно ядро.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seconds', type=float, default=2.0,
+            help='Сколько секунд гонять каждый замер.',
+        )
+
+    def measure(self, action, seconds):
+        done = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            action()
+            done += 1
+        return done / (time.perf_counter() - started)
+
+    def handle(self, *args, **options):
+        seconds = options['seconds']
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as error:
+                self.stdout.write(f'{path}: недоступен ({error})')
+                continue
+            rate = self.measure(
+                lambda: hasher.verify(PASSWORD, encoded), seconds
+            )
+            self.stdout.write(f'{path}: {rate:.1f} проверок/с')
+
+        request = RequestFactory().post('/auth/login/')
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username='bench-login-user', password=PASSWORD
+            )
+            rate = self.measure(
+                lambda: authenticate(
+                    request, username=user.username, password=PASSWORD
+                ),
+                seconds,
+            )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Вход (authenticate): {rate:.1f} входов/с на ядро'
+        ))
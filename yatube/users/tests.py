@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+
+
+@override_settings(CACHED_LOOKUPS=True)
+class CachedSessionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.context['user'], self.user)
+        return [
+            query['sql'] for query in queries.captured_queries
+            if 'django_session' in query['sql']
+            or 'FROM "auth_user"' in query['sql']
+        ]
+
+    def test_steady_state_has_no_auth_queries(self):
+        """Повторный запрос не читает сессию и пользователя из БД."""
+        url = reverse('posts:post_create')
+        self.auth_queries(url)
+        self.assertEqual(self.auth_queries(url), [])
+
+    def test_user_change_invalidates_cache(self):
+        """Изменение пользователя сбрасывает закэшированный объект."""
+        url = reverse('posts:post_create')
+        self.auth_queries(url)
+        self.user.first_name = 'Иван'
+        self.user.save()
+        self.assertEqual(len(self.auth_queries(url)), 1)
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['user'].first_name, 'Иван')
+
+    @override_settings(CACHED_LOOKUPS=False)
+    def test_password_change_ends_session_without_cache(self):
+        """Без CACHED_LOOKUPS смена пароля сразу завершает сессию."""
+        url = reverse('posts:post_create')
+        self.auth_queries(url)
+        User.objects.filter(pk=self.user.pk).update(
+            password=make_password('new-password'),
+        )
+        response = self.authorized_client.get(url)
+        self.assertRedirects(
+            response, f'{reverse("users:login")}?next={url}',
+        )
+
+
+@override_settings(LOGIN_RATE_LIMITS={'ip': (100, 60), 'username': (3, 60)})
+class LoginTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(
+            username='auth',
+            password=make_password('Pa55word!', hasher='pbkdf2_sha256'),
+        )
+        cls.url = reverse('users:login')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_legacy_hash_upgraded_on_login(self):
+        """Старый PBKDF2-хеш при входе заменяется на Argon2."""
+        response = self.client.post(
+            self.url, {'username': 'auth', 'password': 'Pa55word!'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$'))
+
+    def test_password_guessing_is_rate_limited(self):
+        """Подбор пароля к одному логину упирается в лимит."""
+        for _ in range(3):
+            response = self.client.post(
+                self.url, {'username': 'AUTH', 'password': 'wrong'}
+            )
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            self.url, {'username': 'auth', 'password': 'Pa55word!'}
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertNotIn('_auth_user_id', self.client.session)
@@ -1,5 +1,4 @@
-from django.contrib.auth.views import (LoginView,
-                                       LogoutView,
+from django.contrib.auth.views import (LogoutView,
                                        PasswordResetView,
                                        PasswordChangeView,
                                        PasswordChangeDoneView,
@@ -26,7 +25,7 @@ urlpatterns = [
          name='signup'
          ),
     path('login/',
-         LoginView.
+         views.LoginView.
          as_view(template_name='users/login.html'),
          name='login'
          ),
@@ -1,9 +1,22 @@
+from http import HTTPStatus
+
+from django.contrib.auth import views as auth_views
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
-from .forms import CreationForm
+from .forms import CreationForm, LoginForm
 
 
 class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
+
+
+class LoginView(auth_views.LoginView):
+    authentication_form = LoginForm
+
+    def form_invalid(self, form):
+        response = super().form_invalid(form)
+        if form.rate_limited:
+            response.status_code = HTTPStatus.TOO_MANY_REQUESTS
+        return response
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -51,6 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.SlowRequestMiddleware',
+    'core.middleware.IdentityMapMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,7 +70,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -91,10 +95,42 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Тестовая база — файл, а не память: её должны видеть процессы
+        # пула, которые rebuild_media создаёт через fork.
+        'TEST': {
+            'NAME': os.path.join(tempfile.gettempdir(), 'yatube-test.sqlite3'),
+        },
     }
 }
 
 
+# Сессии читаются из кэша, БД остаётся надёжным хранилищем
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Пользователь сессии тоже берётся из кэша (см. users/backends.py)
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+
+
+# Пароли хешируются Argon2; старые хеши PBKDF2 и bcrypt по-прежнему
+# проверяются и прозрачно перехешируются при входе
+PASSWORD_HASHERS = [
+    'users.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+# Параметры Argon2: память в КиБ, по минимуму рекомендаций OWASP
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 19 * 1024
+ARGON2_PARALLELISM = 1
+
+# Лимиты попыток входа: (размер корзины, секунд на её заполнение)
+LOGIN_RATE_LIMITS = {
+    'ip': (20, 60),
+    'username': (5, 60),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -139,6 +175,17 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Имена с хешем содержимого, сжатые копии и урезанный bootstrap
+# (см. core/static.py); отдаются через yatube/wsgi.py
+STATICFILES_STORAGE = 'core.static.CompressedManifestStaticFilesStorage'
+
+# CSS, из которого при сборке удаляются правила для неиспользуемых классов
+PURGE_CSS = ['css/bootstrap.min.css']
+# Классы, которые появляются в разметке не из шаблонов
+PURGE_CSS_SAFELIST = []
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -153,11 +200,99 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Отдавать медиафайлы из Django и без DEBUG (core/media.py). За прокси
+# передачу можно отдать ему: 'x-accel-redirect' (nginx, внутренний
+# location MEDIA_ACCEL_PREFIX) или 'x-sendfile'; None — sendfile сервера.
+MEDIA_SERVE = True
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Загрузки из этих каталогов хранятся по хешу содержимого с подсчётом
+# ссылок (core/storage.py); миниатюры — в том же хранилище.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+CONTENT_ADDRESSED_PREFIXES = ('posts/',)
+THUMBNAIL_STORAGE = 'core.storage.default'
+# Размеры картинок постов берутся из базы, а не из файла (core/thumbnails.py).
+THUMBNAIL_BACKEND = 'core.thumbnails.StoredSizeBackend'
+# Миниатюры картинок постов, которые строит команда rebuild_media; должны
+# совпадать с тегами {% thumbnail %} в шаблонах.
+THUMBNAIL_VARIANTS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+
+# Картинки постов: предел разрешения загрузки, размер большей стороны
+# после уменьшения, качество JPEG и сколько байт держать в памяти.
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_MAX_SIDE = 1920
+IMAGE_JPEG_QUALITY = 82
+IMAGE_SPOOL_SIZE = 2 * 1024 * 1024
+
+# Комментарии: корзина (жетонов, секунд на полное пополнение) на автора,
+# окно отсева одинаковых текстов под постом и буфер пакетной вставки.
+COMMENT_RATE_LIMIT = (5, 60)
+COMMENT_DEDUP_WINDOW = 60
+COMMENT_BUFFER_DELAY = 0.005
+COMMENT_BUFFER_SIZE = 100
+
+# Посты старше этого числа дней команда archive_posts переносит в архив.
+ARCHIVE_AFTER_DAYS = 365
+# Отдельный каталог для картинок архивных постов; None — MEDIA_ROOT.
+ARCHIVE_MEDIA_ROOT = None
+ARCHIVE_MEDIA_URL = None
+# Путь к классу отдельного хранилища архива (важнее ARCHIVE_MEDIA_ROOT).
+ARCHIVE_FILE_STORAGE = None
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.LocMemCache',
     }
 }
+# Кэш выборок по уникальному полю (core/lookup.py). Включать только с
+# кэшем, общим для всех процессов: локальный кэш воркеров не узнает о
+# сбросах из management-команд. Срок жизни — в секундах.
+CACHED_LOOKUPS = False
+CACHED_LOOKUP_TIMEOUTS = {
+    'posts.Group': 60 * 60,
+    'posts.Post': 5 * 60,
+    'auth.User': 5 * 60,
+}
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Адреса, с которых Prometheus может забирать /metrics
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+
+# Журнал медленных запросов (см. core/profiling.py), в секундах
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_REQUEST_THRESHOLD = 0.5
+# Доля запросов, выполняемых под профилировщиком
+PROFILE_SAMPLE_RATE = 0.01
+SLOW_LOG_FILE = os.path.join(BASE_DIR, 'logs', 'slow.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'core.logs.JsonFormatter',
+        },
+    },
+    'handlers': {
+        'slow': {
+            'class': 'core.logs.RotatingFileHandler',
+            'filename': SLOW_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'yatube.slow': {
+            'handlers': ['slow'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
@@ -1,24 +1,31 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.media import media_urls
+from core.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.permission_denied'
 handler500 = 'core.views.server_error'
 
+if settings.DEBUG or settings.MEDIA_SERVE:
+    urlpatterns += media_urls(settings.MEDIA_URL, settings.MEDIA_ROOT)
+    if settings.ARCHIVE_MEDIA_ROOT:
+        urlpatterns += media_urls(
+            settings.ARCHIVE_MEDIA_URL, settings.ARCHIVE_MEDIA_ROOT,
+        )
+
 if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
     import debug_toolbar
 
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Собранная статика отдаётся до Django, с долгим кэшированием.
+from core.static import StaticFilesApplication  # noqa: E402
+
+application = StaticFilesApplication(application)